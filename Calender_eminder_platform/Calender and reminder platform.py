@@ -1,33 +1,39 @@
-from flask import Flask, request, redirect, url_for, render_template_string
+from flask import (Flask, request, redirect, url_for, make_response, abort, jsonify,
+                   Response, stream_with_context)
 import calendar
 from datetime import datetime
-import json
+import atexit
+import io
 import os
+from calendars import CalendarRegistry, DEFAULT_CALENDAR
+from page_cache import MonthPageCache
+from recurrence import check_date, make_rule, month_window
+from reminder_scheduler import notifiers_from_spec
+from bulk_io import READERS, WRITERS, MIMETYPES, guess_format, import_records
 
 app = Flask(__name__)
 REMINDERS_FILE = "reminders.json"
+REMINDERS_DB = "reminders.db"
+# "json" keeps reminders.json as a cached snapshot with an append-only journal;
+# "sqlite" migrates it once into an indexed database.
+REMINDERS_BACKEND = os.environ.get("REMINDERS_BACKEND", "json")
 
-# Load and save reminders
-def load_reminders():
-    if os.path.exists(REMINDERS_FILE):
-        with open(REMINDERS_FILE, "r") as f:
-            return json.load(f)
-    return {}
+# Calendars other than "default" live in their own files under this folder
+CALENDARS_DIR = "calendars"
+# Comma-separated notifiers: log, webhook:<url>, mbox:<path>
+REMINDER_NOTIFIERS = os.environ.get("REMINDER_NOTIFIERS", "log")
 
-def save_reminders(reminders):
-    with open(REMINDERS_FILE, "w") as f:
-        json.dump(reminders, f)
+# Optional comma-separated allow-list of calendar names; empty allows any
+# valid name to be created by a write
+CALENDARS_ALLOWED = [n for n in os.environ.get("CALENDARS_ALLOWED", "").split(",") if n]
+MAX_OPEN_CALENDARS = int(os.environ.get("MAX_OPEN_CALENDARS", 64))
 
-@app.route("/")
-def index():
-    year = int(request.args.get("year", datetime.today().year))
-    month = int(request.args.get("month", datetime.today().month))
-    
-    cal = calendar.monthcalendar(year, month)
-    month_name = calendar.month_name[month]
-    reminders = load_reminders()
+calendars = CalendarRegistry(REMINDERS_BACKEND, CALENDARS_DIR, REMINDERS_FILE, REMINDERS_DB,
+                             notifiers_from_spec(REMINDER_NOTIFIERS),
+                             max_open=MAX_OPEN_CALENDARS, allowed=CALENDARS_ALLOWED)
+atexit.register(calendars.close)
 
-    return render_template_string("""
+MONTH_TEMPLATE_SOURCE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -98,6 +104,37 @@ def index():
             text-align: left;
         }
 
+        .reminder.recurring {
+            color: #7c3aed;
+        }
+
+        .reminder form {
+            display: inline;
+        }
+
+        .reminder button.delete {
+            margin: 0 0 0 4px;
+            padding: 0 5px;
+            background: transparent;
+            color: #999;
+        }
+
+        .reminder button.delete:hover {
+            color: #ef4444;
+        }
+
+        details {
+            font-size: 11px;
+            text-align: left;
+            margin-top: 3px;
+        }
+
+        details select, details input {
+            font-size: 11px;
+            width: 90%;
+            margin-top: 2px;
+        }
+
         input[type="text"] {
             width: 90%;
             padding: 4px;
@@ -126,8 +163,8 @@ def index():
 <body>
     <h1>{{ month_name }} {{ year }}</h1>
     <div class="nav">
-        <a href="/?year={{ year if month > 1 else year - 1 }}&month={{ month - 1 if month > 1 else 12 }}">← Prev</a>
-        <a href="/?year={{ year if month < 12 else year + 1 }}&month={{ month + 1 if month < 12 else 1 }}">Next →</a>
+        <a href="/?calendar={{ calendar_name }}&year={{ year if month > 1 else year - 1 }}&month={{ month - 1 if month > 1 else 12 }}">← Prev</a>
+        <a href="/?calendar={{ calendar_name }}&year={{ year if month < 12 else year + 1 }}&month={{ month + 1 if month < 12 else 1 }}">Next →</a>
     </div>
 
     <table>
@@ -143,12 +180,43 @@ def index():
                         {% if day != 0 %}
                             <div class="date">{{ day }}</div>
                             {% set date_str = "%04d-%02d-%02d" | format(year, month, day) %}
-                            {% if date_str in reminders %}
-                                <div class="reminder">📌 {{ reminders[date_str] }}</div>
-                            {% endif %}
+                            {% for text in reminders.get(date_str, []) %}
+                                <div class="reminder">📌 {{ text }}
+                                    <form method="POST" action="/reminder/delete">
+                                        <input type="hidden" name="calendar" value="{{ calendar_name }}">
+                                        <input type="hidden" name="date" value="{{ date_str }}">
+                                        <input type="hidden" name="index" value="{{ loop.index0 }}">
+                                        <button class="delete" type="submit" title="Delete">×</button>
+                                    </form>
+                                </div>
+                            {% endfor %}
+                            {% for rule_id, text in occurrences.get(date_str, []) %}
+                                <div class="reminder recurring">🔁 {{ text }}
+                                    <form method="POST" action="/reminder/delete">
+                                        <input type="hidden" name="calendar" value="{{ calendar_name }}">
+                                        <input type="hidden" name="date" value="{{ date_str }}">
+                                        <input type="hidden" name="rule" value="{{ rule_id }}">
+                                        <button class="delete" type="submit" name="scope" value="occurrence" title="Skip this day">×</button>
+                                        <button class="delete" type="submit" name="scope" value="series" title="Delete series">⨯⨯</button>
+                                    </form>
+                                </div>
+                            {% endfor %}
                             <form method="POST" action="/reminder">
+                                <input type="hidden" name="calendar" value="{{ calendar_name }}">
                                 <input type="hidden" name="date" value="{{ date_str }}">
                                 <input type="text" name="reminder" placeholder="Reminder">
+                                <details>
+                                    <summary>Repeat</summary>
+                                    <select name="repeat">
+                                        <option value="">Never</option>
+                                        <option value="daily">Daily</option>
+                                        <option value="weekly">Weekly</option>
+                                        <option value="monthly">Monthly</option>
+                                        <option value="yearly">Yearly</option>
+                                    </select>
+                                    <input type="number" name="interval" min="1" value="1" title="Every N">
+                                    <input type="date" name="until" title="Until">
+                                </details>
                                 <button type="submit">Save</button>
                             </form>
                         {% endif %}
@@ -159,21 +227,204 @@ def index():
     </table>
 </body>
 </html>
-""", year=year, month=month, month_name=month_name, cal=cal, reminders=reminders)
+"""
+
+# Compiled once at startup instead of on every request
+MONTH_TEMPLATE = app.jinja_env.from_string(MONTH_TEMPLATE_SOURCE)
+page_cache = MonthPageCache()
+
+def current_calendar():
+    """The calendar named by the request (query string or form), default if
+    none. Only write requests create a calendar that doesn't exist yet."""
+    name = request.values.get("calendar") or DEFAULT_CALENDAR
+    try:
+        return calendars.get(name, create=request.method == "POST")
+    except ValueError as e:
+        abort(400, str(e))
+    except LookupError as e:
+        abort(404, str(e))
+
+def month_key(cal, date):
+    return (cal.name, int(date[:4]), int(date[5:7]))
+
+@app.route("/")
+def index():
+    cal = current_calendar()
+    year = int(request.args.get("year", datetime.today().year))
+    month = int(request.args.get("month", datetime.today().month))
+    key = (cal.name, year, month)
+
+    cached = page_cache.get(key)
+    if cached is None:
+        epoch = page_cache.epoch(key)
+        weeks = calendar.monthcalendar(year, month)
+        month_name = calendar.month_name[month]
+        reminders = cal.store.month(year, month)
+        # Recurring reminders are expanded for this month only
+        occurrences = cal.rules.expand(*month_window(year, month))
+        html = MONTH_TEMPLATE.render(year=year, month=month, month_name=month_name,
+                                     cal=weeks, reminders=reminders, occurrences=occurrences,
+                                     calendar_name=cal.name)
+        cached = page_cache.put(key, html, epoch)
+    etag, html = cached
+
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(html)
+    response.set_etag(etag)
+    # Browsers must revalidate so a save elsewhere shows up on the next view.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def back_to_month(cal, date):
+    return redirect(url_for("index", calendar=cal.name, year=date.split("-")[0], month=date.split("-")[1]))
 
 @app.route("/reminder", methods=["POST"])
 def reminder():
+    cal = current_calendar()
     date = request.form["date"]
     text = request.form["reminder"].strip()
-    
-    reminders = load_reminders()
-    if text:
-        reminders[date] = text
-    elif date in reminders:
-        del reminders[date]
-    
-    save_reminders(reminders)
-    return redirect(url_for("index", year=date.split("-")[0], month=date.split("-")[1]))
+    repeat = request.form.get("repeat", "")
+    # Checked before anything is stored: the scheduler, month_key and later
+    # startups all parse it
+    try:
+        check_date(date)
+    except ValueError as e:
+        abort(400, str(e))
+
+    if text and repeat:
+        try:
+            rule = make_rule(text, date, repeat, request.form.get("interval") or 1,
+                             request.form.get("until") or None)
+        except ValueError as e:
+            abort(400, str(e))
+        with cal.lock:
+            rule = cal.store.save_rule(rule)
+            cal.rules.add(rule)
+            cal.scheduler.rule_saved(rule)
+        # A series can show up in any month after it starts
+        page_cache.clear(cal.name)
+        return back_to_month(cal, date)
+
+    with cal.lock:
+        if text:
+            cal.store.add(date, text)
+            cal.scheduler.item_added(date, text)
+        else:
+            for old in cal.store.get(date):
+                cal.scheduler.item_removed(date, old)
+            cal.store.set(date, [])
+        cal.reindex(date)
+    page_cache.invalidate(month_key(cal, date))
+    return back_to_month(cal, date)
+
+@app.route("/reminder/delete", methods=["POST"])
+def delete_reminder():
+    cal = current_calendar()
+    date = request.form["date"]
+    # Checked before taking the lock, like the create route
+    try:
+        check_date(date)
+        rule_id = int(request.form["rule"]) if "rule" in request.form else None
+        index = int(request.form["index"]) if rule_id is None else None
+    except (KeyError, ValueError) as e:
+        abort(400, str(e))
+
+    with cal.lock:
+        if rule_id is not None:
+            rule = cal.rules.get(rule_id)
+            if rule is None:
+                abort(404)
+            if request.form.get("scope") == "series":
+                cal.store.delete_rule(rule["id"])
+                cal.rules.remove(rule["id"])
+                cal.scheduler.rule_removed(rule["id"])
+                page_cache.clear(cal.name)
+                return back_to_month(cal, date)
+            rule = cal.store.save_rule(dict(rule, exceptions=sorted(set(rule["exceptions"]) | {date})))
+            cal.rules.add(rule)
+            cal.scheduler.rule_saved(rule)
+        else:
+            texts = cal.store.get(date)
+            if 0 <= index < len(texts):
+                cal.store.remove(date, index)
+                cal.scheduler.item_removed(date, texts[index])
+                cal.reindex(date)
+    page_cache.invalidate(month_key(cal, date))
+    return back_to_month(cal, date)
+
+@app.route("/import", methods=["POST"])
+def bulk_import():
+    cal = current_calendar()
+    fmt = request.args.get("format") or guess_format(request.args.get("filename"))
+    if fmt not in READERS:
+        abort(400, f"Unknown format: {fmt}")
+
+    def imported_rule(rule):
+        cal.rules.add(rule)
+        cal.scheduler.rule_saved(rule)
+
+    def imported_batch(pairs):
+        for date, text in pairs:
+            cal.scheduler.item_added(date, text)
+        for date in {date for date, _ in pairs}:
+            cal.reindex(date)
+
+    # Read the body as it arrives instead of buffering the whole upload
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        with cal.lock:
+            report = import_records(cal.store, READERS[fmt](lines), on_rule=imported_rule,
+                                    on_batch=imported_batch)
+    except UnicodeDecodeError as e:
+        abort(400, f"Upload is not valid UTF-8: {e}")
+    finally:
+        # Batches written before a decode error are already stored
+        page_cache.clear(cal.name)
+    return jsonify(report.as_dict())
+
+@app.route("/export")
+def bulk_export():
+    cal = current_calendar()
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in WRITERS:
+        abort(400, f"Unknown format: {fmt}")
+    response = Response(stream_with_context(WRITERS[fmt](cal.store)), mimetype=MIMETYPES[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename={cal.name}.{fmt}"
+    return response
+
+def page_args():
+    try:
+        return request.args.get("cursor"), int(request.args.get("limit", 50))
+    except ValueError:
+        abort(400, "limit must be a number")
+
+@app.route("/search")
+def search():
+    cal = current_calendar()
+    cursor, limit = page_args()
+    try:
+        results, next_cursor = cal.search.search(request.args.get("q", ""), cursor, limit)
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify(results=results, next_cursor=next_cursor)
+
+@app.route("/reminders")
+def reminders_in_range():
+    cal = current_calendar()
+    cursor, limit = page_args()
+    try:
+        results, next_cursor = cal.search.date_range(request.args.get("start"), request.args.get("end"),
+                                                     cursor, limit)
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify(results=results, next_cursor=next_cursor)
+
+# The debug reloader's file-watcher process also runs this module; only the
+# process that serves requests (or a WSGI server importing it) fires reminders.
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    calendars.start_schedulers_now()
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,223 @@
+"""Load and latency benchmarks for the calendar app.
+
+Seeds a synthetic store of each requested size, then drives the app's
+routes through the Flask test client from several threads and reports
+requests/second, p50/p95/p99 latency and peak RSS as JSON:
+
+    python benchmarks/bench_app.py --sizes 1000,10000,100000,1000000 \\
+        --backend sqlite --threads 4 --requests 2000 --output bench.json
+
+Every size runs in its own subprocess so peak RSS and caches don't leak
+from one size into the next.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(APP_DIR, "Calender and reminder platform.py")
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FIRST_DAY = date(2000, 1, 1)
+SPAN_DAYS = 365 * 30
+
+
+def seed_store(backend, size, rng):
+    """Writes size reminders spread over SPAN_DAYS into the default calendar
+    files in the current directory, bypassing the app."""
+    sys.path.insert(0, APP_DIR)
+    from reminder_store import open_store
+
+    store = open_store(backend, "reminders.json", "reminders.db")
+    try:
+        batch = []
+        for i in range(size):
+            day = FIRST_DAY + timedelta(days=rng.randrange(SPAN_DAYS))
+            batch.append((day.isoformat(), f"Synthetic reminder {i}"))
+            if len(batch) == 10_000:
+                store.add_many(batch)
+                batch = []
+        if batch:
+            store.add_many(batch)
+        if backend == "json":
+            store.compact()
+    finally:
+        store.close()
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("calendar_app", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def drive(app, make_request, total, threads):
+    """Runs total requests spread over threads; returns throughput and latency."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker(worker_id):
+        client = app.test_client()
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            started = time.perf_counter()
+            status = make_request(client, i, worker_id)
+            local.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": len(errors),
+        "seconds": round(elapsed, 4),
+        "rps": round(total / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_size(backend, size, requests, threads, seed):
+    """Runs the scenarios against a fresh store in a temporary directory,
+    which is removed afterwards."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"calbench-{size}-") as workdir:
+        os.chdir(workdir)
+        try:
+            return _run_size(backend, size, requests, threads, seed)
+        finally:
+            os.chdir(cwd)
+
+
+def _run_size(backend, size, requests, threads, seed):
+    rng = random.Random(seed)
+    os.environ["REMINDERS_BACKEND"] = backend
+    os.environ["REMINDER_NOTIFIERS"] = ""
+
+    started = time.perf_counter()
+    seed_store(backend, size, rng)
+    seed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    module = load_app()
+    app = module.app
+    startup_seconds = time.perf_counter() - started
+
+    months = [(y, m) for y in range(FIRST_DAY.year, FIRST_DAY.year + SPAN_DAYS // 365) for m in range(1, 13)]
+    hot = months[len(months) // 2]
+    save_days = [(FIRST_DAY + timedelta(days=rng.randrange(SPAN_DAYS))).isoformat() for _ in range(requests)]
+
+    def month_view_cold(client, i, _):
+        # Cycles through every month so most views miss the page cache.
+        year, month = months[i % len(months)]
+        return client.get(f"/?year={year}&month={month}").status_code
+
+    def month_view_hot(client, i, _):
+        year, month = hot
+        return client.get(f"/?year={year}&month={month}").status_code
+
+    etag = app.test_client().get(f"/?year={hot[0]}&month={hot[1]}").headers.get("ETag")
+
+    def month_view_304(client, i, _):
+        year, month = hot
+        return client.get(f"/?year={year}&month={month}", headers={"If-None-Match": etag}).status_code
+
+    def save(client, i, _):
+        return client.post("/reminder", data={"date": save_days[i], "reminder": f"Bench {i}"}).status_code
+
+    def delete(client, i, _):
+        return client.post("/reminder/delete", data={"date": save_days[i], "index": "0"}).status_code
+
+    scenarios = {}
+    for name, fn in [("month_view_cold", month_view_cold), ("month_view_hot", month_view_hot),
+                     ("month_view_304", month_view_304), ("save", save), ("delete", delete)]:
+        scenarios[name] = drive(app, fn, requests, threads)
+    # Stop the store and scheduler threads before the directory is removed
+    module.calendars.close()
+
+    return {
+        "backend": backend,
+        "size": size,
+        "threads": threads,
+        "seed_seconds": round(seed_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "scenarios": scenarios,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single is not None:
+        json.dump(run_size(args.backend, args.single, args.requests, args.threads, args.seed), sys.stdout)
+        return
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        print(f"[bench] {args.backend} store, {size} reminders...", file=sys.stderr)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(size), "--backend", args.backend,
+             "--threads", str(args.threads), "--requests", str(args.requests), "--seed", str(args.seed)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
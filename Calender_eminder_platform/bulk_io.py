@@ -0,0 +1,297 @@
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+
+from recurrence import FREQUENCIES, make_rule
+
+# --- Bulk import / export ---
+# Both formats are read and written one line at a time so memory use stays
+# flat however large the file is. Imports are applied in batches, each batch
+# being a single store write (one SQLite transaction or one journal fsync).
+#
+# NDJSON lines look like
+#   {"date": "2024-01-05", "text": "Dentist"}
+#   {"rule": {"text": "Rent", "start": "2024-01-31", "freq": "monthly", ...}}
+# and .ics files hold all-day VEVENTs, with RRULE/EXDATE for recurring ones.
+
+BATCH_SIZE = 1000
+MAX_REPORTED_REJECTS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.rules = 0
+        self.rejected = 0
+        self.errors = []  # first MAX_REPORTED_REJECTS (line, message) pairs
+        self.batches = 0
+        self.seconds = 0.0
+
+    def reject(self, line_no, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_REJECTS:
+            self.errors.append((line_no, message))
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "rules": self.rules,
+            "rejected": self.rejected,
+            "errors": [{"line": n, "error": m} for n, m in self.errors],
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else None,
+        }
+
+
+def _check_date(value):
+    return date.fromisoformat(value).isoformat()
+
+
+# --- Readers: yield (line_no, record) or (line_no, ValueError) ---
+def read_ndjson(lines):
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+            if "rule" in obj:
+                r = obj["rule"]
+                until = _check_date(r["until"]) if r.get("until") else None
+                exceptions = [_check_date(day) for day in r.get("exceptions", ())]
+                yield line_no, ("rule", make_rule(r["text"], _check_date(r["start"]), r["freq"],
+                                                  r.get("interval", 1), until, exceptions))
+            else:
+                text = str(obj["text"]).strip()
+                if not text:
+                    raise ValueError("empty text")
+                yield line_no, ("item", _check_date(obj["date"]), text)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            yield line_no, ValueError(f"{type(e).__name__}: {e}")
+
+
+def _ics_unescape(value):
+    out, chars = [], iter(value)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append("\n" if nxt in "nN" else nxt)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _ics_date(value):
+    # DATE (20240105) or DATE-TIME (20240105T090000[Z]); only the day matters.
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8])).isoformat()
+
+
+def _unfold(lines):
+    line_no, current = 0, None
+    for n, raw in enumerate(lines, 1):
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield line_no, current
+        line_no, current = n, raw
+    if current is not None:
+        yield line_no, current
+
+
+def read_ics(lines):
+    event = None
+    for line_no, line in _unfold(lines):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {"line": line_no, "exdates": []}
+        elif event is None:
+            continue
+        elif name == "END" and value.upper() == "VEVENT":
+            try:
+                yield event["line"], _ics_record(event)
+            except (ValueError, KeyError, IndexError) as e:
+                yield event["line"], ValueError(f"{type(e).__name__}: {e}")
+            event = None
+        elif name == "EXDATE":
+            event["exdates"].extend(v for v in value.split(",") if v)
+        else:
+            event[name] = value
+
+
+def _ics_record(event):
+    start = _ics_date(event["DTSTART"])
+    text = _ics_unescape(event.get("SUMMARY", "")).strip()
+    if not text:
+        raise ValueError("empty SUMMARY")
+    if "RRULE" not in event:
+        return "item", start, text
+    parts = dict(p.split("=", 1) for p in event["RRULE"].split(";") if "=" in p)
+    freq = parts.get("FREQ", "").lower()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"unsupported FREQ {parts.get('FREQ')}")
+    until = _ics_date(parts["UNTIL"]) if "UNTIL" in parts else None
+    return "rule", make_rule(text, start, freq, parts.get("INTERVAL", 1), until,
+                             [_ics_date(d) for d in event["exdates"]])
+
+
+READERS = {"ndjson": read_ndjson, "ics": read_ics}
+
+
+def import_records(store, records, batch_size=BATCH_SIZE, on_rule=None, on_batch=None):
+    """Applies reader output to store in batches and returns an ImportReport.
+
+    on_rule is called with each stored rule and on_batch with each stored
+    list of (date, text) pairs, so callers can keep in-memory indexes current.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    batch, rules = [], []
+
+    def flush_items():
+        store.add_many(batch)
+        if on_batch is not None:
+            on_batch(batch)
+        report.imported += len(batch)
+        report.batches += 1
+
+    def flush_rules():
+        for rule in store.save_rules(rules):
+            if on_rule is not None:
+                on_rule(rule)
+        report.rules += len(rules)
+        report.batches += 1
+
+    for line_no, record in records:
+        report.rows += 1
+        if isinstance(record, ValueError):
+            report.reject(line_no, str(record))
+        elif record[0] == "rule":
+            rules.append(record[1])
+            if len(rules) >= batch_size:
+                flush_rules()
+                rules = []
+        else:
+            batch.append((record[1], record[2]))
+            if len(batch) >= batch_size:
+                flush_items()
+                batch = []
+    if batch:
+        flush_items()
+    if rules:
+        flush_rules()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# --- Writers: generators of text chunks ---
+def export_ndjson(store):
+    for rule in store.rules():
+        yield json.dumps({"rule": {k: v for k, v in rule.items() if k != "id"}}) + "\n"
+    for day, texts in store.items():
+        for text in texts:
+            yield json.dumps({"date": day, "text": text}) + "\n"
+
+
+def _ics_escape(value):
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line):
+    # RFC 5545 caps content lines at 75 octets; continuation lines start with a space.
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, chunk = [], b""
+    for ch in line:
+        encoded = ch.encode("utf-8")
+        if len(chunk) + len(encoded) > (75 if not parts else 74):
+            parts.append(chunk.decode("utf-8"))
+            chunk = b""
+        chunk += encoded
+    parts.append(chunk.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_day(value):
+    return value.replace("-", "")
+
+
+def export_ics(store):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Calendar and reminder platform//EN\r\n"
+    for rule in store.rules():
+        rrule = f"FREQ={rule['freq'].upper()};INTERVAL={rule.get('interval', 1)}"
+        if rule.get("until"):
+            rrule += f";UNTIL={_ics_day(rule['until'])}"
+        lines = ["BEGIN:VEVENT", f"UID:rule-{rule['id']}@calendar", f"DTSTAMP:{stamp}",
+                 f"DTSTART;VALUE=DATE:{_ics_day(rule['start'])}", f"RRULE:{rrule}"]
+        if rule.get("exceptions"):
+            lines.append("EXDATE;VALUE=DATE:" + ",".join(_ics_day(d) for d in rule["exceptions"]))
+        lines += [f"SUMMARY:{_ics_escape(rule['text'])}", "END:VEVENT"]
+        yield "".join(_ics_fold(line) for line in lines)
+    for day, texts in store.items():
+        for i, text in enumerate(texts):
+            lines = ["BEGIN:VEVENT", f"UID:{day}-{i}@calendar", f"DTSTAMP:{stamp}",
+                     f"DTSTART;VALUE=DATE:{_ics_day(day)}", f"SUMMARY:{_ics_escape(text)}", "END:VEVENT"]
+            yield "".join(_ics_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+
+WRITERS = {"ndjson": export_ndjson, "ics": export_ics}
+MIMETYPES = {"ndjson": "application/x-ndjson", "ics": "text/calendar"}
+
+
+def guess_format(path, default="ndjson"):
+    if path and path.lower().endswith((".ics", ".ical")):
+        return "ics"
+    return default
+
+
+def main(argv=None):
+    """CLI: python bulk_io.py import|export FILE [--format ndjson|ics].
+
+    Writes straight to the store files; if the web app is running with the
+    same store, use its /import endpoint instead so its page cache and rule
+    index pick up the changes.
+    """
+    from reminder_store import open_store
+
+    parser = argparse.ArgumentParser(description="Bulk import/export of calendar reminders")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("file", help="input/output file, or - for stdin/stdout")
+    parser.add_argument("--format", choices=sorted(READERS))
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--json-file", default="reminders.json")
+    parser.add_argument("--db-file", default="reminders.db")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    fmt = args.format or guess_format(args.file)
+
+    store = open_store(args.backend, args.json_file, args.db_file)
+    try:
+        if args.command == "import":
+            source = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8", newline="")
+            with source:
+                report = import_records(store, READERS[fmt](source), args.batch_size)
+            print(json.dumps(report.as_dict(), indent=2))
+        else:
+            target = sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8", newline="")
+            with target:
+                for chunk in WRITERS[fmt](store):
+                    target.write(chunk)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from recurrence import RuleIndex
+from reminder_scheduler import ReminderScheduler
+from reminder_store import open_store
+from search_index import ReminderSearchIndex
+
+# --- Per-user calendar partitions ---
+# Every calendar has its own store files, rule index, search index and
+# scheduler, so a request only ever loads and locks its own calendar's data.
+# The "default" calendar keeps using the original reminders.json/.db files.
+
+DEFAULT_CALENDAR = "default"
+MAX_OPEN_CALENDARS = 64
+_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def valid_name(name):
+    return bool(_NAME.fullmatch(name or ""))
+
+
+class Calendar:
+    def __init__(self, name, store, notifiers):
+        self.name = name
+        self.store = store
+        rules = store.rules()
+        self.rules = RuleIndex(rules)
+        self.search = ReminderSearchIndex(store.items())
+        self.scheduler = ReminderScheduler(store, rules, notifiers, name=name)
+        # Serializes read-modify-write sequences that span the store and the
+        # in-memory indexes (e.g. adding an exception to a rule).
+        self.lock = threading.RLock()
+
+    def reindex(self, date):
+        self.search.update(date, self.store.get(date))
+
+    def close(self):
+        self.scheduler.stop()
+        self.store.close()
+
+
+class CalendarRegistry:
+    """Opens calendars on first use and keeps the most recently used ones open.
+
+    Each open calendar holds store files and two threads, so at most
+    max_open are kept; the least recently used one (never the default) is
+    closed to make room. A calendar that has no files yet is only created
+    when the caller asks for it (write requests) and, if allowed is given,
+    only for the names in it, so reads of made-up names cost nothing.
+
+    The registry lock is only held to find or create a per-name slot; the
+    (possibly slow) opening of one calendar never blocks requests for others.
+    """
+
+    def __init__(self, backend, root, default_json, default_db, notifiers, start_schedulers=False,
+                 max_open=MAX_OPEN_CALENDARS, allowed=None):
+        self.backend = backend
+        self.root = root
+        self.default_json = default_json
+        self.default_db = default_db
+        self.notifiers = notifiers
+        self.start_schedulers = start_schedulers
+        self.max_open = max_open
+        self.allowed = set(allowed) if allowed else None
+        self._calendars = OrderedDict()
+        self._opening = {}
+        self._lock = threading.Lock()
+
+    def paths(self, name):
+        if name == DEFAULT_CALENDAR:
+            return self.default_json, self.default_db
+        base = os.path.join(self.root, name)
+        return base + ".json", base + ".db"
+
+    def exists(self, name):
+        json_path, db_path = self.paths(name)
+        return any(os.path.exists(p) for p in (json_path, json_path + ".journal", db_path))
+
+    def get(self, name, create=False):
+        """The open calendar called name. Raises ValueError for a bad or
+        not-allowed name and LookupError for a calendar that doesn't exist
+        yet, unless create is set."""
+        with self._lock:
+            cal = self._calendars.get(name)
+            if cal is not None:
+                self._calendars.move_to_end(name)
+                return cal
+        if not valid_name(name):
+            raise ValueError(f"Invalid calendar name: {name!r}")
+        if name != DEFAULT_CALENDAR:
+            if self.allowed is not None and name not in self.allowed:
+                raise ValueError(f"Calendar not allowed: {name!r}")
+            if not create and not self.exists(name):
+                raise LookupError(f"No such calendar: {name!r}")
+        with self._lock:
+            slot = self._opening.setdefault(name, threading.Lock())
+        with slot:
+            cal = self._calendars.get(name)
+            if cal is None:
+                if name != DEFAULT_CALENDAR:
+                    os.makedirs(self.root, exist_ok=True)
+                json_path, db_path = self.paths(name)
+                cal = Calendar(name, open_store(self.backend, json_path, db_path), self.notifiers)
+                if self.start_schedulers:
+                    cal.scheduler.start()
+                with self._lock:
+                    self._calendars[name] = cal
+                    evicted = self._evict()
+                    self._opening.pop(name, None)
+                for old in evicted:
+                    # Let a write in progress on it finish first
+                    with old.lock:
+                        old.close()
+        return cal
+
+    def _evict(self):
+        # Caller holds self._lock
+        evicted = []
+        for name in list(self._calendars):
+            if len(self._calendars) <= self.max_open:
+                break
+            if name != DEFAULT_CALENDAR:
+                evicted.append(self._calendars.pop(name))
+        return evicted
+
+    def start_schedulers_now(self):
+        with self._lock:
+            self.start_schedulers = True
+            calendars = list(self._calendars.values())
+        for cal in calendars:
+            cal.scheduler.start()
+
+    def close(self):
+        with self._lock:
+            calendars = list(self._calendars.values())
+            self._calendars = {}
+        for cal in calendars:
+            cal.close()
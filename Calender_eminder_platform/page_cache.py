@@ -0,0 +1,54 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- Rendered month page cache ---
+# Most traffic flips between the same few months, so the rendered HTML for a
+# (calendar, year, month) is kept along with a strong ETag until a save
+# touches it.
+
+
+class MonthPageCache:
+    def __init__(self, max_pages=256):
+        self.max_pages = max_pages
+        self._pages = OrderedDict()  # key -> (etag, html)
+        self._epochs = {}            # key -> invalidation count
+        self._generations = {}       # calendar -> clear() count
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                self._pages.move_to_end(key)
+            return entry
+
+    def epoch(self, key):
+        """Taken before reading the store; put() drops pages that a save
+        invalidated while they were being rendered."""
+        with self._lock:
+            return self._generations.get(key[0], 0), self._epochs.get(key, 0)
+
+    def put(self, key, html, epoch):
+        etag = hashlib.sha1(html.encode("utf-8")).hexdigest()
+        entry = (etag, html)
+        with self._lock:
+            if (self._generations.get(key[0], 0), self._epochs.get(key, 0)) != epoch:
+                return entry
+            self._pages[key] = entry
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._epochs[key] = self._epochs.get(key, 0) + 1
+            self._pages.pop(key, None)
+
+    def clear(self, calendar):
+        """Drops every page of one calendar, e.g. after a recurring rule changed."""
+        with self._lock:
+            self._generations[calendar] = self._generations.get(calendar, 0) + 1
+            for key in [k for k in self._pages if k[0] == calendar]:
+                del self._pages[key]
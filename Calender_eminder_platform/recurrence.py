@@ -0,0 +1,162 @@
+import bisect
+import calendar
+import threading
+from datetime import date, timedelta
+
+# --- Recurring reminders ---
+# A rule is a plain dict so stores can persist it as-is:
+#   {"id": 7, "text": "Pay rent", "start": "2024-01-31", "freq": "monthly",
+#    "interval": 1, "until": None, "exceptions": ["2024-03-31"]}
+# Occurrences are never stored; they are expanded for the visible window only.
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+
+def parse_date(value):
+    return date(int(value[:4]), int(value[5:7]), int(value[8:10]))
+
+
+def check_date(value):
+    """value if it's a YYYY-MM-DD date, else ValueError - rules are only
+    expanded much later, so a bad date must be caught before it's stored."""
+    if not isinstance(value, str) or len(value) != 10 or date.fromisoformat(value).isoformat() != value:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD)")
+    return value
+
+
+def make_rule(text, start, freq, interval=1, until=None, exceptions=()):
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency: {freq}")
+    interval = int(interval)
+    if interval < 1:
+        raise ValueError("Interval must be at least 1")
+    check_date(start)
+    if until:
+        check_date(until)
+    for day in exceptions:
+        check_date(day)
+    if until and until < start:
+        raise ValueError("Rule ends before it starts")
+    return {"text": text, "start": start, "freq": freq, "interval": interval,
+            "until": until or None, "exceptions": sorted(set(exceptions))}
+
+
+def _add_months(start, months):
+    """start shifted by whole months, or None if that day doesn't exist
+    (e.g. the 31st in April) - such months are skipped, not clamped."""
+    index = start.year * 12 + start.month - 1 + months
+    year, month = divmod(index, 12)
+    if start.day > calendar.monthrange(year, month + 1)[1]:
+        return None
+    return date(year, month + 1, start.day)
+
+
+def occurrences(rule, window_start, window_end):
+    """Yields the dates of rule falling inside [window_start, window_end].
+
+    The first candidate is computed arithmetically, so the cost depends on
+    the window size and not on how long ago the series started.
+    """
+    start = parse_date(rule["start"])
+    last = window_end
+    if rule.get("until"):
+        last = min(last, parse_date(rule["until"]))
+    first = max(start, window_start)
+    if first > last:
+        return
+    exceptions = set(rule.get("exceptions") or ())
+    freq = rule["freq"]
+    interval = rule.get("interval", 1)
+
+    if freq in ("daily", "weekly"):
+        step = interval * (7 if freq == "weekly" else 1)
+        k = -(-(first - start).days // step)
+        current = start + timedelta(days=k * step)
+        while current <= last:
+            if current.isoformat() not in exceptions:
+                yield current
+            current += timedelta(days=step)
+        return
+
+    months = 12 * interval if freq == "yearly" else interval
+    elapsed = (first.year - start.year) * 12 + first.month - start.month
+    k = max(0, -(-elapsed // months))
+    misses = 0
+    while True:
+        current = _add_months(start, k * months)
+        k += 1
+        if current is None:
+            # Guard against rules that can never match (e.g. Feb 30th).
+            misses += 1
+            if misses > 400:
+                return
+            continue
+        misses = 0
+        if current > last:
+            return
+        if current >= first and current.isoformat() not in exceptions:
+            yield current
+
+
+class RuleIndex:
+    """In-memory index of rules for month-window expansion.
+
+    Yearly rules are bucketed by their month of the year, since they can only
+    ever land in that month; everything else lives in one bucket. Buckets
+    are sorted by start date, so rules that begin after the window are never
+    looked at.
+    """
+
+    def __init__(self, rules=()):
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._buckets = {}  # 0 for non-yearly, 1-12 for yearly -> sorted [(start, id)]
+        for rule in rules:
+            self.add(rule)
+
+    @staticmethod
+    def _bucket(rule):
+        return int(rule["start"][5:7]) if rule["freq"] == "yearly" else 0
+
+    def add(self, rule):
+        with self._lock:
+            self._remove(rule["id"])
+            self._rules[rule["id"]] = rule
+            bisect.insort(self._buckets.setdefault(self._bucket(rule), []), (rule["start"], rule["id"]))
+
+    def remove(self, rule_id):
+        with self._lock:
+            self._remove(rule_id)
+
+    def _remove(self, rule_id):
+        rule = self._rules.pop(rule_id, None)
+        if rule is not None:
+            bucket = self._buckets[self._bucket(rule)]
+            bucket.pop(bisect.bisect_left(bucket, (rule["start"], rule_id)))
+
+    def get(self, rule_id):
+        return self._rules.get(rule_id)
+
+    def expand(self, window_start, window_end):
+        """Returns {date_str: [(rule_id, text), ...]} for the window."""
+        window_start_str = window_start.isoformat()
+        window_end_str = window_end.isoformat()
+        months = {window_start.month, window_end.month}
+        if (window_end - window_start).days >= 31:
+            months = set(range(1, 13))
+        result = {}
+        with self._lock:
+            for key in [0] + sorted(months):
+                bucket = self._buckets.get(key, ())
+                stop = bisect.bisect_right(bucket, (window_end_str, float("inf")))
+                for _, rule_id in bucket[:stop]:
+                    rule = self._rules[rule_id]
+                    if rule.get("until") and rule["until"] < window_start_str:
+                        continue
+                    for day in occurrences(rule, window_start, window_end):
+                        result.setdefault(day.isoformat(), []).append((rule_id, rule["text"]))
+        return result
+
+
+def month_window(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
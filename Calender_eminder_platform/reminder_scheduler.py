@@ -0,0 +1,223 @@
+import heapq
+import itertools
+import json
+import logging
+import mailbox
+import threading
+import urllib.request
+from datetime import date, datetime, time, timedelta
+from email.message import EmailMessage
+
+from recurrence import occurrences, parse_date
+
+# --- Due-reminder scheduler ---
+# Upcoming reminders sit in a min-heap ordered by due time and a single
+# thread sleeps until the earliest one. Edits made through the app push or
+# cancel entries incrementally; nothing ever rescans the whole store.
+#
+# One-off reminders are cancelled lazily: the heap entry stays put and is
+# dropped when it surfaces if its (date, text) is no longer live. Recurring
+# rules keep only their next occurrence in the heap, tagged with the rule's
+# generation so entries from an edited or deleted rule are skipped.
+
+log = logging.getLogger("reminders")
+
+REMIND_AT = time(9, 0)  # time of day an all-day reminder comes due
+
+
+class LogNotifier:
+    def __call__(self, reminder):
+        log.info("Reminder due %s: %s", reminder["date"], reminder["text"])
+
+
+class WebhookNotifier:
+    """POSTs the reminder as JSON. Failures are logged, never retried."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, reminder):
+        body = json.dumps(reminder).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=self.timeout).close()
+        except OSError as e:
+            log.warning("Webhook %s failed: %s", self.url, e)
+
+
+class MailSpoolNotifier:
+    """Appends each reminder as a message to a local mbox spool."""
+
+    def __init__(self, path, to="calendar@localhost"):
+        self.path = path
+        self.to = to
+
+    def __call__(self, reminder):
+        msg = EmailMessage()
+        msg["From"] = "calendar@localhost"
+        msg["To"] = self.to
+        msg["Subject"] = f"Reminder: {reminder['text']}"
+        msg.set_content(f"{reminder['date']}: {reminder['text']}\n")
+        spool = mailbox.mbox(self.path)
+        spool.lock()
+        try:
+            spool.add(msg)
+            spool.flush()
+        finally:
+            spool.unlock()
+            spool.close()
+
+
+def notifiers_from_spec(spec):
+    """Builds notifiers from e.g. "log,webhook:http://host/hook,mbox:/var/spool/cal"."""
+    notifiers = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, arg = part.partition(":")
+        if kind == "log":
+            notifiers.append(LogNotifier())
+        elif kind == "webhook":
+            notifiers.append(WebhookNotifier(arg))
+        elif kind == "mbox":
+            notifiers.append(MailSpoolNotifier(arg))
+        else:
+            raise ValueError(f"Unknown notifier: {kind}")
+    return notifiers
+
+
+class ReminderScheduler:
+    def __init__(self, store, rules, notifiers, remind_at=REMIND_AT, now=datetime.now, name=None):
+        self.store = store
+        self.name = name
+        self.notifiers = list(notifiers)
+        self.remind_at = remind_at
+        self.now = now
+        self._heap = []  # (due, seq, kind, payload)
+        self._seq = itertools.count()
+        self._live = {}  # (date, text) -> number of live copies
+        self._rule_gen = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._load(rules)
+
+    def _due(self, day):
+        return datetime.combine(parse_date(day), self.remind_at)
+
+    def _push(self, due, kind, payload):
+        heapq.heappush(self._heap, (due, next(self._seq), kind, payload))
+        # The thread may be sleeping towards a later (or cancelled) deadline
+        self._cond.notify()
+
+    def _load(self, rules):
+        # Startup is the only time the store is read in bulk, and only from
+        # today onwards.
+        now = self.now()
+        with self._cond:
+            for day, texts in self.store.items(start=now.date().isoformat()):
+                for text in texts:
+                    self._add_item(day, text, now)
+            for rule in rules:
+                self._schedule_rule(rule, now)
+
+    # --- incremental updates ---
+    def _add_item(self, day, text, now, late_ok=False):
+        # Past-due reminders are skipped at startup (an earlier run already
+        # fired them), but one added today after REMIND_AT fires right away.
+        due = self._due(day)
+        if due < now and not (late_ok and day == now.date().isoformat()):
+            return
+        key = (day, text)
+        self._live[key] = self._live.get(key, 0) + 1
+        self._push(due, "item", key)
+
+    def item_added(self, day, text):
+        with self._cond:
+            self._add_item(day, text, self.now(), late_ok=True)
+
+    def item_removed(self, day, text):
+        with self._cond:
+            key = (day, text)
+            if self._live.get(key, 0) > 1:
+                self._live[key] -= 1
+            else:
+                self._live.pop(key, None)
+
+    def _schedule_rule(self, rule, now, after=None):
+        gen = self._rule_gen.get(rule["id"], 0) + 1
+        self._rule_gen[rule["id"]] = gen
+        if after is not None:
+            start = after + timedelta(days=1)
+        else:
+            start = now.date()
+            if self._due(start.isoformat()) < now:
+                start += timedelta(days=1)
+        nxt = next(occurrences(rule, start, date.max), None)
+        if nxt is not None:
+            self._push(self._due(nxt.isoformat()), "rule", (rule["id"], gen, rule, nxt))
+
+    def rule_saved(self, rule):
+        with self._cond:
+            self._schedule_rule(rule, self.now())
+
+    def rule_removed(self, rule_id):
+        with self._cond:
+            self._rule_gen[rule_id] = self._rule_gen.get(rule_id, 0) + 1
+
+    # --- dispatch loop ---
+    def _pop_due(self):
+        """Blocks until something is due and returns it, or None once stopped."""
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = (self._heap[0][0] - self.now()).total_seconds()
+                if delay > 0:
+                    self._cond.wait(min(delay, 3600))
+                    continue
+                due, _, kind, payload = heapq.heappop(self._heap)
+                if kind == "item":
+                    if payload not in self._live:
+                        continue
+                    self.item_removed(*payload)
+                    return {"calendar": self.name, "date": payload[0], "text": payload[1],
+                            "due": due.isoformat(), "rule_id": None}
+                rule_id, gen, rule, day = payload
+                if self._rule_gen.get(rule_id) != gen:
+                    continue
+                self._schedule_rule(rule, self.now(), after=day)
+                return {"calendar": self.name, "date": day.isoformat(), "text": rule["text"],
+                        "due": due.isoformat(), "rule_id": rule_id}
+        return None
+
+    def _run(self):
+        while True:
+            reminder = self._pop_due()
+            if reminder is None:
+                return
+            for notify in self.notifiers:
+                try:
+                    notify(reminder)
+                except Exception:
+                    log.exception("Notifier %r failed", notify)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"reminder-scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
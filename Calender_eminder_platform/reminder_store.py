@@ -0,0 +1,542 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+# --- Reminder storage backends ---
+# Every backend maps "YYYY-MM-DD" date strings to a list of reminder texts
+# and also keeps the recurrence rules (see recurrence.py). The calendar only
+# ever needs one month at a time, so month() is the hot path.
+
+
+def month_bounds(year, month):
+    """Returns the [start, end) date-string range covering one month."""
+    return "%04d-%02d-01" % (year, month), "%04d-%02d-32" % (year, month)
+
+
+def _as_list(value):
+    # Stores written before multiple reminders per date hold a bare string.
+    if isinstance(value, str):
+        return [value] if value else []
+    return list(value)
+
+
+class JsonReminderStore:
+    """JSON snapshot plus an append-only journal, cached in memory.
+
+    Reads are served from per-month buckets and only hit the disk for two
+    stat() calls; the cache is rebuilt when another process changes either
+    file. Writes append one line to the journal and are fsynced in batches,
+    and a background thread compacts the journal into a new snapshot that is
+    written to a temp file and renamed into place, so a crash never leaves a
+    half-written reminders.json behind.
+
+    Journal records carry the full new state of what they touch (a date's
+    whole list, a whole rule), so replaying them more than once is harmless.
+    Writers hold an flock on a side file while they refresh and append, so
+    two processes editing the same store can't overwrite each other's lists.
+    """
+
+    FSYNC_BATCH = 32          # writes between forced fsyncs
+    FSYNC_INTERVAL = 1.0      # seconds before a pending write is fsynced anyway
+    COMPACT_BYTES = 1 << 20   # journal size that triggers compaction
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._months = {}  # "YYYY-MM" -> {date: [text, ...]}
+        self._rules = {}   # id -> rule
+        self._snapshot_sig = None
+        self._journal_sig = None
+        self._journal_offset = 0
+        self._journal = None
+        self._pending_sync = 0
+        self._stop = threading.Event()
+        self._refresh()
+        self._worker = threading.Thread(target=self._background, daemon=True)
+        self._worker.start()
+
+    # --- cache maintenance ---
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh(self):
+        snapshot_sig = self._stat(self.path)
+        journal_sig = self._stat(self.journal_path)
+        if snapshot_sig == self._snapshot_sig and journal_sig == self._journal_sig:
+            return
+        if snapshot_sig != self._snapshot_sig or (journal_sig or (0, 0))[1] < self._journal_offset:
+            # Snapshot replaced or journal truncated: start over.
+            self._months = {}
+            self._rules = {}
+            if snapshot_sig is not None:
+                with open(self.path, "r") as f:
+                    self._load_snapshot(json.load(f))
+            self._journal_offset = 0
+        if journal_sig is not None:
+            self._replay()
+        self._snapshot_sig = snapshot_sig
+        self._journal_sig = self._stat(self.journal_path)
+
+    def _load_snapshot(self, snapshot):
+        if snapshot.get("version") != 2:
+            snapshot = {"reminders": snapshot, "rules": []}
+        for date, texts in snapshot["reminders"].items():
+            self._apply_set(date, _as_list(texts))
+        for rule in snapshot["rules"]:
+            self._rules[rule["id"]] = rule
+
+    def _replay(self):
+        # Only the part of the journal we haven't seen yet is applied. A torn
+        # last line (crash mid-append) has no newline and is left for later.
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._journal_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(record)
+
+    def _apply(self, record):
+        op = record[0]
+        if op == "set":
+            self._apply_set(record[1], record[2])
+        elif op == "rule":
+            self._rules[record[1]["id"]] = record[1]
+        elif op == "unrule":
+            self._rules.pop(record[1], None)
+        else:
+            # Pre-list journal line: [date, text]
+            self._apply_set(record[0], _as_list(record[1]))
+
+    def _apply_set(self, date, texts):
+        if texts:
+            self._months.setdefault(date[:7], {})[date] = list(texts)
+        else:
+            bucket = self._months.get(date[:7])
+            if bucket is not None:
+                bucket.pop(date, None)
+
+    # --- durability ---
+    @contextlib.contextmanager
+    def _exclusive(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open_journal(self):
+        journal = open(self.journal_path, "ab+")
+        # Terminate a torn line left by a crash so our records don't get
+        # glued onto it and discarded along with it.
+        if journal.seek(0, os.SEEK_END) > 0:
+            journal.seek(-1, os.SEEK_END)
+            if journal.read(1) != b"\n":
+                journal.write(b"\n")
+                journal.flush()
+        return journal
+
+    def _write(self, *records):
+        # Caller holds the lock and has already refreshed. All records go out
+        # in one write() so a batch shares a single flush and fsync.
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        if self._journal is None:
+            self._journal = self._open_journal()
+        self._journal.write(data)
+        self._journal.flush()
+        self._journal_offset += len(data)
+        self._journal_sig = self._stat(self.journal_path)
+        for record in records:
+            self._apply(record)
+        self._pending_sync += 1
+        if self._pending_sync >= self.FSYNC_BATCH:
+            self._sync()
+
+    def _sync(self):
+        if self._pending_sync and self._journal is not None:
+            os.fsync(self._journal.fileno())
+            self._pending_sync = 0
+
+    def compact(self):
+        with self._exclusive():
+            self._refresh()
+            snapshot = {
+                "version": 2,
+                "reminders": {d: t for bucket in self._months.values() for d, t in bucket.items()},
+                "rules": list(self._rules.values()),
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            _fsync_dir(self.path)
+            # Replaying the old journal over the new snapshot is harmless, so
+            # a crash between the rename and the truncate loses nothing.
+            self._sync()
+            with open(self.journal_path, "a") as f:
+                f.truncate(0)
+            self._journal_offset = 0
+            self._snapshot_sig = self._stat(self.path)
+            self._journal_sig = self._stat(self.journal_path)
+
+    def _background(self):
+        while not self._stop.wait(self.FSYNC_INTERVAL):
+            with self._lock:
+                self._sync()
+                if self._journal_offset >= self.COMPACT_BYTES:
+                    self.compact()
+
+    # --- store API ---
+    def month(self, year, month):
+        with self._lock:
+            self._refresh()
+            bucket = self._months.get("%04d-%02d" % (year, month), {})
+            return {d: list(t) for d, t in bucket.items()}
+
+    def get(self, date):
+        with self._lock:
+            self._refresh()
+            return list(self._months.get(date[:7], {}).get(date, []))
+
+    def items(self, start=None, end=None):
+        """(date, texts) pairs in date order, optionally limited to [start, end).
+
+        Yields one month bucket at a time, so only that month is copied and
+        sorted; the lock isn't held while the caller consumes a month.
+        """
+        with self._lock:
+            self._refresh()
+            keys = sorted(key for key in self._months
+                          if (start is None or key >= start[:7]) and (end is None or key <= end[:7]))
+        for key in keys:
+            with self._lock:
+                self._refresh()
+                month = sorted((d, list(t)) for d, t in self._months.get(key, {}).items()
+                               if (start is None or d >= start) and (end is None or d < end))
+            yield from month
+
+    def set(self, date, texts):
+        with self._exclusive():
+            self._refresh()
+            self._write(["set", date, [t for t in texts if t]])
+
+    def add(self, date, text):
+        with self._exclusive():
+            self._refresh()
+            self._write(["set", date, self._months.get(date[:7], {}).get(date, []) + [text]])
+
+    def add_many(self, pairs):
+        """Appends (date, text) pairs as one journal write and one fsync."""
+        with self._exclusive():
+            self._refresh()
+            lists = {}
+            for date, text in pairs:
+                if date not in lists:
+                    lists[date] = list(self._months.get(date[:7], {}).get(date, []))
+                lists[date].append(text)
+            if lists:
+                self._write(*(["set", date, texts] for date, texts in lists.items()))
+                self._sync()
+
+    def remove(self, date, index):
+        with self._exclusive():
+            self._refresh()
+            texts = list(self._months.get(date[:7], {}).get(date, []))
+            if 0 <= index < len(texts):
+                del texts[index]
+                self._write(["set", date, texts])
+
+    def rules(self):
+        with self._lock:
+            self._refresh()
+            return [dict(rule) for rule in self._rules.values()]
+
+    def save_rule(self, rule):
+        """Inserts (no "id") or replaces a rule; returns the stored rule."""
+        with self._exclusive():
+            self._refresh()
+            rule = dict(rule)
+            if rule.get("id") is None:
+                rule["id"] = max(self._rules, default=0) + 1
+            self._write(["rule", rule])
+            return dict(rule)
+
+    def save_rules(self, rules):
+        """Inserts or replaces several rules as one journal write and one
+        fsync; returns the stored rules."""
+        with self._exclusive():
+            self._refresh()
+            next_id = max(self._rules, default=0) + 1
+            stored = []
+            for rule in rules:
+                rule = dict(rule)
+                if rule.get("id") is None:
+                    rule["id"] = next_id
+                    next_id += 1
+                stored.append(rule)
+            if stored:
+                self._write(*(["rule", rule] for rule in stored))
+                self._sync()
+            return [dict(rule) for rule in stored]
+
+    def delete_rule(self, rule_id):
+        with self._exclusive():
+            self._refresh()
+            self._write(["unrule", rule_id])
+
+    def close(self):
+        self._stop.set()
+        self._worker.join()
+        with self._lock:
+            self._sync()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+class SqliteReminderStore:
+    """SQLite store in WAL mode, indexed by date.
+
+    A month view is a single range scan over the date index and a save
+    touches only the rows of one date, so neither depends on how many
+    reminders exist. Connections are kept per thread because the Flask dev
+    server is threaded.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reminder_items ("
+                " id INTEGER PRIMARY KEY,"
+                " date TEXT NOT NULL,"
+                " text TEXT NOT NULL"
+                ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS reminder_items_date ON reminder_items (date, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS rules (id INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                self._upgrade(conn)
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _upgrade(conn):
+        # Version 1 kept one text per date in a "reminders" table.
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reminders'"
+        ).fetchone()
+        if exists:
+            conn.execute("INSERT INTO reminder_items (date, text) SELECT date, text FROM reminders ORDER BY date")
+            conn.execute("DROP TABLE reminders")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def month(self, year, month):
+        start, end = month_bounds(year, month)
+        rows = self._conn().execute(
+            "SELECT date, text FROM reminder_items WHERE date >= ? AND date < ? ORDER BY date, id",
+            (start, end),
+        )
+        result = {}
+        for date, text in rows:
+            result.setdefault(date, []).append(text)
+        return result
+
+    def get(self, date):
+        rows = self._conn().execute("SELECT text FROM reminder_items WHERE date = ? ORDER BY id", (date,))
+        return [text for text, in rows]
+
+    def items(self, start=None, end=None):
+        """(date, texts) pairs in date order, optionally limited to [start, end),
+        streamed from the index."""
+        rows = self._conn().execute(
+            "SELECT date, text FROM reminder_items WHERE date >= ? AND date < ? ORDER BY date, id",
+            (start or "", end or "\uffff"),
+        )
+        current, texts = None, []
+        for date, text in rows:
+            if date != current and texts:
+                yield current, texts
+                texts = []
+            current = date
+            texts.append(text)
+        if texts:
+            yield current, texts
+
+    def set(self, date, texts):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM reminder_items WHERE date = ?", (date,))
+            conn.executemany(
+                "INSERT INTO reminder_items (date, text) VALUES (?, ?)",
+                ((date, t) for t in texts if t),
+            )
+
+    def add(self, date, text):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO reminder_items (date, text) VALUES (?, ?)", (date, text))
+
+    def add_many(self, pairs):
+        """Appends (date, text) pairs in a single transaction."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO reminder_items (date, text) VALUES (?, ?)", pairs)
+
+    def remove(self, date, index):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "DELETE FROM reminder_items WHERE id = ("
+                " SELECT id FROM reminder_items WHERE date = ? ORDER BY id LIMIT 1 OFFSET ?)",
+                (date, index),
+            )
+
+    def rules(self):
+        rows = self._conn().execute("SELECT id, body FROM rules ORDER BY id")
+        return [dict(json.loads(body), id=rule_id) for rule_id, body in rows]
+
+    def save_rule(self, rule):
+        """Inserts (no "id") or replaces a rule; returns the stored rule."""
+        rule = dict(rule)
+        body = json.dumps({k: v for k, v in rule.items() if k != "id"})
+        conn = self._conn()
+        with conn:
+            if rule.get("id") is None:
+                rule["id"] = conn.execute("INSERT INTO rules (body) VALUES (?)", (body,)).lastrowid
+            else:
+                conn.execute("INSERT OR REPLACE INTO rules (id, body) VALUES (?, ?)", (rule["id"], body))
+        return rule
+
+    def save_rules(self, rules):
+        """Inserts or replaces several rules in a single transaction."""
+        stored = []
+        conn = self._conn()
+        with conn:
+            for rule in rules:
+                rule = dict(rule)
+                body = json.dumps({k: v for k, v in rule.items() if k != "id"})
+                if rule.get("id") is None:
+                    rule["id"] = conn.execute("INSERT INTO rules (body) VALUES (?)", (body,)).lastrowid
+                else:
+                    conn.execute("INSERT OR REPLACE INTO rules (id, body) VALUES (?, ?)", (rule["id"], body))
+                stored.append(rule)
+        return stored
+
+    def delete_rule(self, rule_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
+
+    def migrate_from_json(self, json_path):
+        """One-shot import of an existing reminders.json (and its journal).
+
+        The import is recorded in the meta table, so later startups skip it
+        even if the JSON file is still lying around.
+        """
+        conn = self._conn()
+        done = conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+        if done or not (os.path.exists(json_path) or os.path.exists(json_path + ".journal")):
+            return 0
+        source = JsonReminderStore(json_path)
+        try:
+            items = list(source.items())
+            rules = source.rules()
+        finally:
+            source.close()
+        with conn:
+            conn.executemany(
+                "INSERT INTO reminder_items (date, text) VALUES (?, ?)",
+                ((d, t) for d, texts in items for t in texts),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO rules (id, body) VALUES (?, ?)",
+                ((r["id"], json.dumps({k: v for k, v in r.items() if k != "id"})) for r in rules),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                (os.path.abspath(json_path),),
+            )
+        return len(items)
+
+    def close(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+
+
+def _fsync_dir(path):
+    """Makes a rename in path's directory durable, where the OS allows it.
+    Windows can't open directories, and some filesystems refuse to fsync
+    them; the rename itself has still happened, so that isn't an error."""
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def open_store(backend, json_path, db_path):
+    """Builds the configured backend; "sqlite" migrates json_path on first use."""
+    if backend == "sqlite":
+        store = SqliteReminderStore(db_path)
+        store.migrate_from_json(json_path)
+        return store
+    if backend == "json":
+        return JsonReminderStore(json_path)
+    raise ValueError(f"Unknown reminder backend: {backend}")
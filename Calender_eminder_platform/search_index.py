@@ -0,0 +1,122 @@
+import base64
+import bisect
+import json
+import re
+import threading
+
+# --- Reminder search ---
+# An inverted index (token -> sorted list of dates) plus a sorted list of all
+# dates that have reminders. Both are built once at startup and then patched
+# one date at a time as reminders are saved or deleted.
+#
+# Queries walk the shortest posting list from the cursor position and stop
+# after one page, so a page costs the same whether 10 or 10 million
+# reminders match.
+
+MAX_PAGE = 500
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return set(_TOKEN.findall(text.lower()))
+
+
+def encode_cursor(date, index):
+    return base64.urlsafe_b64encode(json.dumps([date, index]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Returns the (date, index) of the last item already returned."""
+    if not cursor:
+        return None
+    try:
+        date, index = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(date), int(index)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+class ReminderSearchIndex:
+    def __init__(self, items=()):
+        self._lock = threading.Lock()
+        self._texts = {}     # date -> [text, ...]
+        self._postings = {}  # token -> sorted [date, ...]
+        self._dates = []     # sorted dates that have reminders
+        for date, texts in items:
+            self.update(date, texts)
+
+    def update(self, date, texts):
+        """Replaces everything indexed for date with texts."""
+        texts = list(texts)
+        with self._lock:
+            old = self._texts.pop(date, [])
+            old_tokens = set().union(*map(tokenize, old))
+            new_tokens = set().union(*map(tokenize, texts))
+            for token in old_tokens - new_tokens:
+                postings = self._postings[token]
+                del postings[bisect.bisect_left(postings, date)]
+                if not postings:
+                    del self._postings[token]
+            for token in new_tokens - old_tokens:
+                bisect.insort(self._postings.setdefault(token, []), date)
+            if texts:
+                self._texts[date] = texts
+                if not old:
+                    bisect.insort(self._dates, date)
+            elif old:
+                del self._dates[bisect.bisect_left(self._dates, date)]
+
+    def _page(self, dates, after, limit, match=None):
+        # dates: iterator of dates at or after the cursor date, in order
+        results = []
+        for date in dates:
+            for index, text in enumerate(self._texts.get(date, ())):
+                if after is not None and (date, index) <= after:
+                    continue
+                if match is not None and not match <= tokenize(text):
+                    continue
+                if len(results) == limit:
+                    last = results[-1]
+                    return results, encode_cursor(last["date"], last["index"])
+                results.append({"date": date, "index": index, "text": text})
+        return results, None
+
+    def search(self, query, cursor=None, limit=50):
+        """Reminders containing every word of query, in date order."""
+        tokens = tokenize(query)
+        limit = max(1, min(limit, MAX_PAGE))
+        after = decode_cursor(cursor)
+        with self._lock:
+            postings = [self._postings.get(t) for t in tokens]
+            if not postings or not all(postings):
+                return [], None
+            shortest = min(postings, key=len)
+            others = [p for p in postings if p is not shortest]
+
+            def in_all(date):
+                for p in others:
+                    i = bisect.bisect_left(p, date)
+                    if i == len(p) or p[i] != date:
+                        return False
+                return True
+
+            start = 0 if after is None else bisect.bisect_left(shortest, after[0])
+            dates = (d for d in _walk(shortest, start, len(shortest)) if in_all(d))
+            return self._page(dates, after, limit, match=tokens)
+
+    def date_range(self, start=None, end=None, cursor=None, limit=50):
+        """Reminders dated in [start, end], in date order."""
+        limit = max(1, min(limit, MAX_PAGE))
+        after = decode_cursor(cursor)
+        if start and (after is None or start > after[0]):
+            after = (start, -1)
+        with self._lock:
+            first = 0 if after is None else bisect.bisect_left(self._dates, after[0])
+            stop = len(self._dates) if not end else bisect.bisect_right(self._dates, end)
+            return self._page(_walk(self._dates, first, stop), after, limit)
+
+
+def _walk(seq, start, stop):
+    # Index-based so a page never copies the rest of the list
+    for i in range(start, stop):
+        yield seq[i]
@@ -2,28 +2,121 @@ int REDPIN = 13;
 int YELLOWPIN = 12;
 int GREENPIN = 11;
 
+// --- Host link (see signal_bridge.py) ---
+// Frame: 0xA5 | type | seq | len | payload | CRC-16/CCITT (big-endian)
+// PHASE payload: head, light (0 red, 1 yellow, 2 green, 3 off), hold_ms (u16)
+// Every valid frame is ACKed; a bad CRC gets a NAK with seq 0.
+// Without a PHASE for hold_ms the board runs its own fixed cycle again.
+const byte SYNC = 0xA5;
+const byte MSG_PHASE = 0x01;
+const byte MSG_PING = 0x02;
+const byte MSG_ACK = 0x81;
+const byte MSG_NAK = 0x82;
+const byte MAX_PAYLOAD = 32;
+const byte HEAD_ID = 0;  // which signal head this board drives
+const unsigned long STEP_MS = 2000;
+
+byte frame[3 + MAX_PAYLOAD + 2];  // type, seq, len, payload, crc
+byte frameLen = 0;
+bool inFrame = false;
+
+bool hostControl = false;
+unsigned long holdUntil = 0;
+unsigned long stepStarted = 0;
+byte standaloneLight = 0;
+
+void setLight(byte light) {
+  digitalWrite(REDPIN, light == 0 ? HIGH : LOW);
+  digitalWrite(YELLOWPIN, light == 1 ? HIGH : LOW);
+  digitalWrite(GREENPIN, light == 2 ? HIGH : LOW);
+}
+
+unsigned int crc16(const byte *data, byte len) {
+  unsigned int crc = 0xFFFF;
+  for (byte i = 0; i < len; i++) {
+    crc ^= (unsigned int)data[i] << 8;
+    for (byte b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(byte type, byte seq) {
+  byte out[6] = {SYNC, type, seq, 0, 0, 0};
+  unsigned int crc = crc16(out + 1, 3);
+  out[4] = crc >> 8;
+  out[5] = crc & 0xFF;
+  Serial.write(out, 6);
+}
+
+void handleFrame() {
+  byte type = frame[0];
+  byte seq = frame[1];
+  byte len = frame[2];
+  if (type == MSG_PHASE && len == 4) {
+    if (frame[3] == HEAD_ID) {
+      unsigned int hold = ((unsigned int)frame[5] << 8) | frame[6];
+      setLight(frame[4]);
+      hostControl = true;
+      holdUntil = millis() + hold;
+    }
+  }
+  sendFrame(MSG_ACK, seq);
+}
+
+void readHost() {
+  while (Serial.available() > 0) {
+    byte b = Serial.read();
+    if (!inFrame) {
+      if (b == SYNC) {
+        inFrame = true;
+        frameLen = 0;
+      }
+      continue;
+    }
+    frame[frameLen++] = b;
+    if (frameLen == 3 && frame[2] > MAX_PAYLOAD) {
+      inFrame = false;  // can't be a frame; wait for the next SYNC
+      continue;
+    }
+    if (frameLen >= 3 && frameLen == 3 + frame[2] + 2) {
+      byte len = frame[2];
+      unsigned int got = ((unsigned int)frame[3 + len] << 8) | frame[4 + len];
+      if (got == crc16(frame, 3 + len)) {
+        handleFrame();
+      } else {
+        sendFrame(MSG_NAK, 0);
+      }
+      inFrame = false;
+    }
+  }
+}
+
 void setup() {
   pinMode(REDPIN, OUTPUT);
   pinMode(YELLOWPIN, OUTPUT);
   pinMode(GREENPIN, OUTPUT);
+  Serial.begin(115200);
+  setLight(0);
+  stepStarted = millis();
 }
 
 void loop() {
-  // Red ON
-  digitalWrite(REDPIN, HIGH);
-  digitalWrite(YELLOWPIN, LOW);
-  digitalWrite(GREENPIN, LOW);
-  delay(2000);
-
-  // Yellow ON
-  digitalWrite(REDPIN, LOW);
-  digitalWrite(YELLOWPIN, HIGH);
-  digitalWrite(GREENPIN, LOW);
-  delay(2000);
-
-  // Green ON
-  digitalWrite(REDPIN, LOW);
-  digitalWrite(YELLOWPIN, LOW);
-  digitalWrite(GREENPIN, HIGH);
-  delay(2000);
+  readHost();
+
+  if (hostControl && (long)(millis() - holdUntil) > 0) {
+    // Host went quiet: back to the standalone cycle, starting from red
+    hostControl = false;
+    standaloneLight = 0;
+    stepStarted = millis();
+    setLight(standaloneLight);
+  }
+
+  if (!hostControl && millis() - stepStarted >= STEP_MS) {
+    // Standalone cycle: red -> yellow -> green, 2 seconds each
+    standaloneLight = (standaloneLight + 1) % 3;
+    stepStarted = millis();
+    setLight(standaloneLight);
+  }
 }
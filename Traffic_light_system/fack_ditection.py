@@ -1,16 +1,47 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+from collections import deque
 import pandas as pd
+import joblib
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
 import numpy as np
 import time
 
 # --- Global Variables for Model and Vectorizer ---
-# These will be trained/fitted once when the application starts
+# Loaded from the saved artifact on first use, or trained once if there is
+# no artifact for the current dataset + hyperparameters
 MODEL = None
 VECTORIZER = None
+ARTIFACT_KEY = None
+MODEL_FILE = None  # set by --model to use a given artifact instead
 MOCK_DATASET_SIZE = 500
+MOCK_SEED = 1234
+
+# Everything that changes the fitted model; part of the artifact key
+HYPERPARAMS = {
+    'tfidf': {'stop_words': 'english', 'max_df': 0.7, 'max_features': 5000},
+    'logreg': {'random_state': 42},
+    'test_size': 0.2,
+    'split_random_state': 42,
+}
+
+# --- Model artifacts ---
+# models/fake_news-<key>.joblib holds the (model, vectorizer) pair, dumped
+# uncompressed so joblib can memory-map the large arrays (IDF weights and
+# coefficients) instead of reading them in. The .json next to it holds the
+# metadata, and is written last, so it only exists for a complete artifact.
+MODEL_DIR = os.environ.get("FAKE_NEWS_MODEL_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
 
 def create_mock_dataset():
     """
@@ -38,26 +69,28 @@ def create_mock_dataset():
         "Health Officials Advise on New Vaccination Guidelines for Flu Season"
     ]
 
-    # Create the dataset
+    # Create the dataset (seeded, so the same dataset maps to the same artifact)
+    rng = np.random.default_rng(MOCK_SEED)
     data = []
     # Create the headlines, ensuring an approximate 50/50 split
     for i in range(MOCK_DATASET_SIZE // 2):
-        data.append({'text': f"Title: {np.random.choice(real_headlines)}. Article body: The details are confirmed. {i}", 'label': 0}) # 0 = Real
-        data.append({'text': f"Title: {np.random.choice(fake_headlines)}. Article body: Sources confirm this is true. {i}", 'label': 1}) # 1 = Fake
+        data.append({'text': f"Title: {rng.choice(real_headlines)}. Article body: The details are confirmed. {i}", 'label': 0}) # 0 = Real
+        data.append({'text': f"Title: {rng.choice(fake_headlines)}. Article body: Sources confirm this is true. {i}", 'label': 1}) # 1 = Fake
 
     # Shuffle the data
-    df = pd.DataFrame(data).sample(frac=1).reset_index(drop=True)
+    df = pd.DataFrame(data).sample(frac=1, random_state=MOCK_SEED).reset_index(drop=True)
     return df
 
-def train_model(df):
+def train_model(df, hyperparams=HYPERPARAMS):
     """
     Trains the Logistic Regression model using TF-IDF features.
 
     Args:
         df (pd.DataFrame): The dataset containing 'text' and 'label' columns.
+        hyperparams (dict): Vectorizer/model/split settings, see HYPERPARAMS.
 
     Returns:
-        tuple: (fitted_model, fitted_vectorizer)
+        tuple: (fitted_model, fitted_vectorizer, validation_metrics)
     """
     print(f"[{time.strftime('%H:%M:%S')}] Starting model training...")
 
@@ -66,67 +99,293 @@ def train_model(df):
     y = df['label']
 
     # 2. Train-Test Split (Optional, but good practice to check model performance)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=hyperparams['test_size'], random_state=hyperparams['split_random_state'])
 
     # 3. TF-IDF Vectorization
     # Using TfidfVectorizer to convert text data into numerical feature vectors.
     # We limit features to the top 5000 to keep it lightweight.
-    tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_df=0.7, max_features=5000)
+    tfidf_vectorizer = TfidfVectorizer(**hyperparams['tfidf'])
     tfidf_train = tfidf_vectorizer.fit_transform(X_train)
     tfidf_test = tfidf_vectorizer.transform(X_test)
 
     # 4. Logistic Regression Model Training
     # Logistic Regression is a strong baseline for binary classification like this.
-    log_reg = LogisticRegression(random_state=42)
+    log_reg = LogisticRegression(**hyperparams['logreg'])
     log_reg.fit(tfidf_train, y_train)
 
     # 5. Evaluation
-    y_pred = log_reg.predict(tfidf_test)
+    proba = log_reg.predict_proba(tfidf_test)[:, 1]
+    y_pred = (proba >= 0.5).astype(int)
     accuracy = accuracy_score(y_test, y_pred)
+    metrics = {
+        'accuracy': float(accuracy),
+        'f1': float(f1_score(y_test, y_pred)),
+        'roc_auc': float(roc_auc_score(y_test, proba)) if y_test.nunique() > 1 else None,
+        'n_train': int(len(y_train)),
+        'n_validation': int(len(y_test)),
+    }
     print(f"[{time.strftime('%H:%M:%S')}] Model training complete.")
     print(f"[{time.strftime('%H:%M:%S')}] Validation Accuracy: {accuracy:.4f}")
 
-    return log_reg, tfidf_vectorizer
+    return log_reg, tfidf_vectorizer, metrics
+
+def artifact_key(df, hyperparams=HYPERPARAMS):
+    """
+    Hash of the dataset contents, the hyperparameters and the sklearn version:
+    a saved model is reused only if all three are unchanged.
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df[['text', 'label']], index=False).values.tobytes())
+    digest.update(json.dumps(hyperparams, sort_keys=True).encode('utf-8'))
+    digest.update(sklearn.__version__.encode('utf-8'))
+    return digest.hexdigest()
+
+def artifact_paths(key):
+    base = os.path.join(MODEL_DIR, f"fake_news-{key[:16]}")
+    return base + ".joblib", base + ".json"
+
+def load_metadata(key):
+    """Returns the saved artifact's metadata, or None if there is no complete
+    artifact for key."""
+    _, meta_path = artifact_paths(key)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('key') == key else None
+
+def save_artifact(key, model, vectorizer, metrics, hyperparams=HYPERPARAMS):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    model_path, meta_path = artifact_paths(key)
+    joblib.dump((model, vectorizer), model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+    meta = {
+        'key': key,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sklearn_version': sklearn.__version__,
+        'hyperparams': hyperparams,
+        'metrics': metrics,
+        'n_features': len(vectorizer.vocabulary_),
+    }
+    with open(meta_path + ".tmp", "w", encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+def load_artifact(key):
+    """Loads (model, vectorizer), memory-mapping their arrays."""
+    model_path, _ = artifact_paths(key)
+    return joblib.load(model_path, mmap_mode='r')
+
+def prepare_model(df, hyperparams=HYPERPARAMS):
+    """
+    Makes sure a model for this dataset + hyperparameters exists, training
+    and saving one only if needed. A saved model isn't loaded here; that
+    happens on first use in get_model().
+
+    Returns:
+        dict: The artifact metadata (including validation metrics).
+    """
+    global MODEL, VECTORIZER, ARTIFACT_KEY
+    key = artifact_key(df, hyperparams)
+    meta = load_metadata(key)
+    if meta is None:
+        model, vectorizer, metrics = train_model(df, hyperparams)
+        meta = save_artifact(key, model, vectorizer, metrics, hyperparams)
+        MODEL, VECTORIZER = model, vectorizer
+    else:
+        print(f"[{time.strftime('%H:%M:%S')}] Using saved model {key[:16]} (trained {meta['created']}).")
+        MODEL, VECTORIZER = None, None
+    ARTIFACT_KEY = key
+    return meta
+
+def get_model():
+    """Returns (model, vectorizer), loading the prepared artifact on first use."""
+    global MODEL, VECTORIZER
+    if MODEL is None and MODEL_FILE is not None:
+        MODEL, VECTORIZER = joblib.load(MODEL_FILE, mmap_mode='r')
+    elif MODEL is None and ARTIFACT_KEY is not None:
+        MODEL, VECTORIZER = load_artifact(ARTIFACT_KEY)
+    return MODEL, VECTORIZER
 
 def classify_news(text):
     """
     Takes a string of news text and returns the classification result.
     """
-    global MODEL, VECTORIZER
-    if MODEL is None or VECTORIZER is None:
+    model, vectorizer = get_model()
+    if model is None or vectorizer is None:
         return "Error: Model or Vectorizer is not initialized."
 
-    # 1. Vectorize the input text using the fitted vectorizer
-    input_features = VECTORIZER.transform([text])
-
-    # 2. Get the prediction
-    prediction = MODEL.predict(input_features)[0]
-    
-    # 3. Get the prediction probability (confidence)
-    # The output is [[Prob_Real, Prob_Fake]]
-    probabilities = MODEL.predict_proba(input_features)[0]
+    return classify_batch([text])[0]
 
-    result = "FAKE" if prediction == 1 else "REAL"
-    confidence = probabilities[prediction] * 100
-
-    return result, confidence
-
-def main():
+def classify_batch(texts):
     """
-    Main application logic: initializes the model and runs the CLI loop.
+    Classifies a list of texts with one sparse transform and one
+    predict_proba call; returns [(result, confidence), ...].
     """
-    global MODEL, VECTORIZER
-
-    print("=========================================")
-    print("  Fake News Detector (TF-IDF + LogReg)   ")
-    print("=========================================")
-
-    # 1. Load Data and Train Model
-    try:
-        data_frame = create_mock_dataset()
-        MODEL, VECTORIZER = train_model(data_frame)
-    except Exception as e:
-        print(f"\n[ERROR] Failed to initialize model: {e}")
+    model, vectorizer = get_model()
+    # The output is [[Prob_Real, Prob_Fake], ...]; the label is the likelier class
+    probabilities = model.predict_proba(vectorizer.transform(texts))
+    fake = probabilities[:, 1]
+    return [("FAKE", p * 100) if p >= 0.5 else ("REAL", (1 - p) * 100) for p in fake.tolist()]
+
+# --- Batch mode ---
+# Reads CSV, NDJSON or plain text lines (from a file or stdin) in chunks of
+# chunk_size rows, classifies each chunk in one call and streams the results
+# out as NDJSON. With workers > 1, chunks are scored in a process pool whose
+# workers memory-map the same artifact; at most 2 chunks per worker are in
+# flight, so memory stays bounded however large the input is.
+
+def _parse_record(row, fmt, text_field, id_field):
+    """(id, text) for one input row; raises on a malformed one."""
+    if fmt == 'text':
+        return None, row.rstrip('\r\n')
+    if fmt == 'ndjson':
+        row = json.loads(row)
+        if not isinstance(row, dict):
+            raise ValueError("not a JSON object")
+    text = row.get(text_field)
+    if not isinstance(text, str):
+        raise ValueError(f"missing or non-string {text_field!r}")
+    rid = row.get(id_field)
+    return (None if rid == '' else rid), text  # an empty CSV cell is no id
+
+def read_chunks(stream, fmt, chunk_size, text_field='text', id_field='id'):
+    """Yields lists of (row, id, text, error), where row is the record's
+    0-based number in the input and id is None when the record has none.
+    A malformed record (bad JSON, unreadable CSV, missing text) gets text
+    None and the reason in error, so one bad line doesn't stop the run."""
+    rows = iter(csv.DictReader(stream) if fmt == 'csv' else (line for line in stream if line.strip()))
+    chunk = []
+    n = 0
+    while True:
+        try:
+            rid, text = _parse_record(next(rows), fmt, text_field, id_field)
+            error = None
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:  # ValueError includes JSONDecodeError
+            rid, text, error = None, None, f"{type(e).__name__}: {e}"
+        chunk.append((n, rid, text, error))
+        n += 1
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _score_chunk(chunk):
+    texts = [text for _, _, text, error in chunk if error is None]
+    results = iter(classify_batch(texts) if texts else [])
+    rows = []
+    for n, rid, _, error in chunk:
+        if error is not None:
+            rows.append({'row': n, 'error': error})
+            continue
+        label, conf = next(results)
+        row = {'row': n} if rid is None else {'row': n, 'id': rid}
+        row.update(label=label, confidence=round(conf, 4))
+        rows.append(row)
+    return rows
+
+def _init_worker(key, model_file=None):
+    global ARTIFACT_KEY, MODEL_FILE, MODEL, VECTORIZER
+    ARTIFACT_KEY, MODEL_FILE, MODEL, VECTORIZER = key, model_file, None, None
+
+def run_batch(stream, out, fmt='ndjson', chunk_size=1000, workers=1, text_field='text', id_field='id'):
+    """Classifies every record of stream and writes NDJSON lines to out, in
+    input order. Every line carries the record's row number and, if the
+    record has one, its id; malformed records get an error row. Returns (records
+    classified, records rejected)."""
+    chunks = read_chunks(stream, fmt, chunk_size, text_field, id_field)
+    count = errors = 0
+
+    def emit(rows):
+        nonlocal count, errors
+        out.write(''.join(json.dumps(row) + '\n' for row in rows))
+        bad = sum(1 for row in rows if 'error' in row)
+        count += len(rows) - bad
+        errors += bad
+
+    if workers <= 1:
+        for chunk in chunks:
+            emit(_score_chunk(chunk))
+        return count, errors
+    with mp.Pool(workers, initializer=_init_worker, initargs=(ARTIFACT_KEY, MODEL_FILE)) as pool:
+        inflight = deque()
+        for chunk in chunks:
+            inflight.append(pool.apply_async(_score_chunk, (chunk,)))
+            if len(inflight) >= 2 * workers:
+                emit(inflight.popleft().get())
+        while inflight:
+            emit(inflight.popleft().get())
+    return count, errors
+
+def main(argv=None):
+    """
+    Main application logic: initializes the model and runs the CLI loop,
+    or classifies a whole file/stream with --batch.
+    """
+    global MODEL_FILE
+    parser = argparse.ArgumentParser(description="Fake News Detector (TF-IDF + LogReg)")
+    parser.add_argument("--batch", metavar="INPUT", help="classify INPUT (- for stdin) instead of the CLI loop")
+    parser.add_argument("--format", choices=["csv", "ndjson", "text"], default="text")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--output", default="-", help="NDJSON results file, - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--model", metavar="PATH",
+                        help="use a saved (model, vectorizer) artifact, e.g. one from fake_news_online.py")
+    args = parser.parse_args(argv)
+
+    # In batch mode stdout carries the results, so progress goes to stderr
+    log_to = sys.stderr if args.batch else sys.stdout
+    with contextlib.redirect_stdout(log_to):
+        print("=========================================")
+        print("  Fake News Detector (TF-IDF + LogReg)   ")
+        print("=========================================")
+
+        # 1. Load Data and Train Model (or reuse the saved one)
+        if args.model:
+            MODEL_FILE = args.model
+            # Load it now: a bad path would otherwise only fail on the first
+            # classification, or in every --batch pool worker
+            try:
+                model, vectorizer = get_model()
+                if not hasattr(model, 'predict_proba') or not hasattr(vectorizer, 'transform'):
+                    raise ValueError(f"{args.model} is not a (model, vectorizer) artifact")
+            except Exception as e:
+                print(f"\n[ERROR] Failed to initialize model: {e}")
+                return
+            try:
+                with open(args.model + ".json", encoding='utf-8') as f:
+                    print(f"[{time.strftime('%H:%M:%S')}] Using {args.model}: {json.load(f).get('metrics')}")
+            except (OSError, ValueError):
+                print(f"[{time.strftime('%H:%M:%S')}] Using {args.model}")
+        else:
+            try:
+                data_frame = create_mock_dataset()
+                meta = prepare_model(data_frame)
+                print(f"[{time.strftime('%H:%M:%S')}] Validation metrics: {meta['metrics']}")
+            except Exception as e:
+                print(f"\n[ERROR] Failed to initialize model: {e}")
+                return
+
+    if args.batch:
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            stream = sys.stdin if args.batch == "-" else stack.enter_context(
+                open(args.batch, newline='', encoding='utf-8'))
+            out = sys.stdout if args.output == "-" else stack.enter_context(
+                open(args.output, "w", encoding='utf-8'))
+            count, errors = run_batch(stream, out, args.format, args.chunk_size, args.workers,
+                                      args.text_field, args.id_field)
+        elapsed = time.perf_counter() - started
+        print(f"[{time.strftime('%H:%M:%S')}] Classified {count} records in {elapsed:.2f}s "
+              f"({count / elapsed if elapsed else 0:,.0f}/s), {errors} malformed", file=sys.stderr)
         return
 
     # 2. Start Interactive CLI Loop
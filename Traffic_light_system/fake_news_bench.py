@@ -0,0 +1,150 @@
+"""Benchmarks the sklearn and compiled fake-news scoring paths.
+
+Compares, on the same trained model:
+  - single-item latency (p50/p99 of one classify call per headline)
+  - batch throughput (classify_batch over --batch-size chunks)
+  - startup: wall time of a fresh interpreter that imports the path, loads
+    the model and classifies one text, and that process's peak RSS
+  - agreement: largest |p - p_sklearn| over the benchmark texts
+
+    python fake_news_bench.py
+    python fake_news_bench.py --items 20000 --batch-size 1000 --json
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import fack_ditection
+import fake_news_scorer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Child programs for the startup runs; each prints its load time and peak RSS
+STARTUP = {
+    'sklearn': """
+import time; t = time.perf_counter()
+import fack_ditection
+fack_ditection.MODEL_FILE = {model!r}
+fack_ditection.classify_news("Breaking news")
+""",
+    'compiled': """
+import time; t = time.perf_counter()
+import fake_news_scorer
+fake_news_scorer.CompiledScorer.load({scorer!r}).classify("Breaking news")
+""",
+}
+# ru_maxrss survives exec() on Linux, so it would report the benchmark's own
+# peak; VmHWM belongs to the new address space
+REPORT = """
+import json, resource
+try:
+    with open('/proc/self/status') as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'load_s': time.perf_counter() - t, 'peak_rss_mb': peak_kb / 1024}))
+"""
+
+
+def make_texts(n, seed=0):
+    """Headline-sized variations of the mock dataset texts."""
+    base = fack_ditection.create_mock_dataset()['text'].tolist()
+    rng = random.Random(seed)
+    return [f"{rng.choice(base)} {rng.choice(base).split()[0]} {i}" for i in range(n)]
+
+
+def latency(fn, texts, repeat):
+    samples = []
+    for _ in range(repeat):
+        for text in texts:
+            t = time.perf_counter()
+            fn(text)
+            samples.append(time.perf_counter() - t)
+    us = np.array(samples) * 1e6
+    return {'p50_us': float(np.percentile(us, 50)), 'p99_us': float(np.percentile(us, 99)),
+            'mean_us': float(us.mean())}
+
+
+def throughput(fn, texts, batch_size):
+    t = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        fn(texts[start:start + batch_size])
+    return {'items_per_s': len(texts) / (time.perf_counter() - t)}
+
+
+def startup(kind, model_path, scorer_path, runs):
+    program = STARTUP[kind].format(model=model_path, scorer=scorer_path) + REPORT
+    walls, reports = [], []
+    for _ in range(runs):
+        t = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", program], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout
+        walls.append(time.perf_counter() - t)
+        reports.append(json.loads(out.strip().splitlines()[-1]))
+    return {'wall_s': statistics.median(walls),
+            'load_s': statistics.median(r['load_s'] for r in reports),
+            'peak_rss_mb': max(r['peak_rss_mb'] for r in reports)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000, help="texts for the throughput run")
+    parser.add_argument("--latency-items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        fack_ditection.prepare_model(fack_ditection.create_mock_dataset())
+        model, vectorizer = fack_ditection.get_model()
+        model_path, _ = fack_ditection.artifact_paths(fack_ditection.ARTIFACT_KEY)
+        scorer_path = os.path.splitext(model_path)[0] + ".scorer.json"
+        fake_news_scorer.export(model, vectorizer, scorer_path)
+        scorer = fake_news_scorer.CompiledScorer.load(scorer_path)
+        texts = make_texts(args.items)
+
+    short = texts[:args.latency_items]
+    paths = {
+        'sklearn': (fack_ditection.classify_news, fack_ditection.classify_batch),
+        'compiled': (scorer.classify, scorer.classify_batch),
+    }
+    results = {}
+    for name, (one, batch) in paths.items():
+        one(texts[0])  # warm up
+        results[name] = {
+            'latency': latency(one, short, args.repeat),
+            'batch': throughput(batch, texts, args.batch_size),
+            'startup': startup(name, model_path, scorer_path, args.startup_runs),
+        }
+    results['max_abs_diff'] = fake_news_scorer.check(scorer, model, vectorizer, texts)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    rows = [
+        ("single p50 (us)", 'latency', 'p50_us', "{:.1f}"),
+        ("single p99 (us)", 'latency', 'p99_us', "{:.1f}"),
+        (f"batch of {args.batch_size} (items/s)", 'batch', 'items_per_s', "{:,.0f}"),
+        ("startup wall (s)", 'startup', 'wall_s', "{:.3f}"),
+        ("import + load (s)", 'startup', 'load_s', "{:.3f}"),
+        ("peak RSS (MiB)", 'startup', 'peak_rss_mb', "{:.1f}"),
+    ]
+    print(f"{'':28}{'sklearn':>14}{'compiled':>14}")
+    for label, group, key, fmt in rows:
+        cells = [fmt.format(results[name][group][key]) for name in paths]
+        print(f"{label:28}{cells[0]:>14}{cells[1]:>14}")
+    print(f"max |p - p_sklearn| over {len(texts)} texts: {results['max_abs_diff']:.3g}")
+
+
+if __name__ == "__main__":
+    main()
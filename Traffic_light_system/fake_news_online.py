@@ -0,0 +1,304 @@
+"""Out-of-core training for the fake-news classifier.
+
+Streams a labeled corpus (CSV or NDJSON, any size) in chunks through a
+stateless hashing featurizer, with optional running IDF statistics, into an
+SGD logistic-regression model trained with partial_fit. Nothing proportional
+to the corpus is ever held in memory. A fixed share of the records is routed,
+by a hash of the text, to a held-out validation stream that is never trained
+on; a bounded reservoir of it is scored at the end. `update` folds new
+labeled data into an existing model without retraining from scratch.
+
+    python fake_news_online.py train corpus.csv --format csv --idf --epochs 2
+    python fake_news_online.py update new_labels.ndjson --format ndjson --label pants-fire=1 --label mostly-true=0
+    python fack_ditection.py --model models/fake_news_online.joblib --batch articles.ndjson --format ndjson
+
+The saved artifact is a (classifier, featurizer) pair like the TF-IDF one,
+so fack_ditection.py can load it with --model.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score, log_loss, roc_auc_score
+from sklearn.preprocessing import normalize
+
+from fack_ditection import MODEL_DIR, create_mock_dataset
+
+DEFAULT_MODEL = os.path.join(MODEL_DIR, "fake_news_online.joblib")
+CLASSES = np.array([0, 1])
+# Label text -> class (1 = FAKE). "true"/"false" are veracity labels, so
+# "true" means REAL. Anything else is rejected unless mapped with --label.
+LABELS = {"0": 0, "1": 1, "real": 0, "fake": 1, "true": 0, "false": 1}
+MAX_REPORTED_REJECTS = 5
+
+
+class StreamingTfidf:
+    """Hashing featurizer with optional streaming IDF.
+
+    The hashing step needs no vocabulary, so any chunk can be transformed
+    on its own. With use_idf, partial_fit() keeps running document
+    frequencies per hash bucket, and transform() weights by the IDF of
+    everything seen so far, with the same smoothing as TfidfVectorizer.
+    """
+
+    def __init__(self, n_features=2**20, use_idf=False, stop_words='english', ngram_range=(1, 2)):
+        self.n_features = n_features
+        self.use_idf = use_idf
+        self.hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                        stop_words=stop_words, ngram_range=ngram_range)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64) if use_idf else None
+        self.n_docs = 0
+        self._idf = None
+
+    def partial_fit(self, texts):
+        counts = self.hasher.transform(texts)
+        self.n_docs += counts.shape[0]
+        if self.use_idf:
+            # csr rows hold each bucket once, so this counts documents
+            self.doc_freq += np.bincount(counts.indices, minlength=self.n_features)
+            self._idf = None
+        return counts
+
+    def idf(self):
+        if self._idf is None:
+            self._idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1
+        return self._idf
+
+    def transform(self, texts, counts=None):
+        features = self.hasher.transform(texts) if counts is None else counts.astype(np.float64)
+        if self.use_idf:
+            features.data *= self.idf()[features.indices]
+        return normalize(features, copy=False)
+
+
+def parse_label(value, labels=LABELS):
+    """0 or 1 for a known label; ValueError for anything else."""
+    number = value
+    if isinstance(value, str):
+        key = value.strip().lower()
+        if key in labels:
+            return labels[key]
+        try:
+            number = float(key)  # "1.0", "0.0"
+        except ValueError:
+            number = None
+    if isinstance(number, bool) or not isinstance(number, (int, float)) or number not in (0, 1):
+        raise ValueError(f"unknown label {value!r}")
+    return int(number)
+
+
+def read_labeled(path, fmt, text_field='text', label_field='label', labels=LABELS, rejected=None):
+    """Yields (text, label) from a CSV/NDJSON file, stdin ('-') or 'mock'.
+
+    Records that are malformed or have an unknown label are skipped; their
+    reasons are counted in the rejected Counter, if given.
+    """
+    if path == 'mock':
+        for row in create_mock_dataset().itertuples(index=False):
+            yield row.text, int(row.label)
+        return
+    stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        rows = csv.DictReader(stream) if fmt == 'csv' else (line for line in stream if line.strip())
+        for line_no, row in enumerate(rows, 1):
+            try:
+                if fmt != 'csv':
+                    row = json.loads(row)
+                text = row[text_field]
+                if not isinstance(text, str):
+                    raise ValueError(f"{text_field} is not a string")
+                label = parse_label(row[label_field], labels)
+            except (ValueError, KeyError, TypeError) as e:
+                if rejected is not None:
+                    reason = f"{type(e).__name__}: {e}"
+                    if rejected[reason] == 0 and len(rejected) >= MAX_REPORTED_REJECTS:
+                        reason = "other"
+                    rejected[reason] += 1
+                continue
+            yield text, label
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def is_validation(text, pct):
+    """Stable split: the same text always lands on the same side."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=4).digest(), 'big') % 100 < pct
+
+
+class ValidationReservoir:
+    """Uniform sample of at most size held-out records (reservoir sampling)."""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.texts, self.labels = [], []
+        self.rng = random.Random(seed)
+
+    def add(self, text, label):
+        self.seen += 1
+        if len(self.texts) < self.size:
+            self.texts.append(text)
+            self.labels.append(label)
+        else:
+            i = self.rng.randrange(self.seen)
+            if i < self.size:
+                self.texts[i], self.labels[i] = text, label
+
+
+def train_stream(records, classifier, featurizer, chunk_size=10000, validation_pct=5,
+                 reservoir=None, on_chunk=None, update_idf=True):
+    """Feeds records through partial_fit chunk by chunk. Held-out records go
+    to reservoir instead. Pass update_idf=False on repeat passes over the
+    same data so documents aren't counted twice. Returns the number of
+    records trained on."""
+    trained = 0
+    texts, labels = [], []
+
+    def flush():
+        counts = featurizer.partial_fit(texts) if update_idf else featurizer.hasher.transform(texts)
+        classifier.partial_fit(featurizer.transform(texts, counts), labels, classes=CLASSES)
+        if on_chunk:
+            on_chunk(trained)
+
+    for text, label in records:
+        if is_validation(text, validation_pct):
+            if reservoir is not None:
+                reservoir.add(text, label)
+            continue
+        texts.append(text)
+        labels.append(label)
+        if len(texts) == chunk_size:
+            trained += len(texts)
+            flush()
+            texts, labels = [], []
+    if texts:
+        trained += len(texts)
+        flush()
+    return trained
+
+
+def evaluate(classifier, featurizer, reservoir, chunk_size=10000):
+    if not reservoir.texts:
+        return {'n_validation': 0}
+    probs = []
+    for start in range(0, len(reservoir.texts), chunk_size):
+        features = featurizer.transform(reservoir.texts[start:start + chunk_size])
+        probs.append(classifier.predict_proba(features)[:, 1])
+    proba = np.concatenate(probs)
+    y = np.array(reservoir.labels)
+    pred = (proba >= 0.5).astype(int)
+    return {
+        'accuracy': float(accuracy_score(y, pred)),
+        'f1': float(f1_score(y, pred, zero_division=0)),
+        'log_loss': float(log_loss(y, proba, labels=CLASSES)),
+        'roc_auc': float(roc_auc_score(y, proba)) if len(set(reservoir.labels)) > 1 else None,
+        'n_validation': int(len(y)),
+        'n_validation_seen': int(reservoir.seen),
+    }
+
+
+def save_model(path, classifier, featurizer, meta):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    joblib.dump((classifier, featurizer), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    with open(path + ".json.tmp", "w", encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+def load_model(path):
+    classifier, featurizer = joblib.load(path)
+    with open(path + ".json", encoding='utf-8') as f:
+        meta = json.load(f)
+    return classifier, featurizer, meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["train", "update"])
+    parser.add_argument("input", help="labeled CSV/NDJSON file, - for stdin, or 'mock'")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--label-field", default="label")
+    parser.add_argument("--label", action="append", default=[], metavar="NAME=0|1",
+                        help="extra label mapping, e.g. pants-fire=1 (repeatable)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--epochs", type=int, default=1, help="passes over the input (train only)")
+    parser.add_argument("--validation-pct", type=int, default=5)
+    parser.add_argument("--validation-size", type=int, default=50000, help="held-out records kept for scoring")
+    parser.add_argument("--idf", action="store_true", help="weight features by streaming IDF")
+    parser.add_argument("--n-features", type=int, default=2**20)
+    parser.add_argument("--alpha", type=float, default=1e-6)
+    args = parser.parse_args(argv)
+    labels = dict(LABELS)
+    for spec in args.label:
+        name, _, value = spec.rpartition('=')
+        if not name or value not in ('0', '1'):
+            parser.error(f"--label expects NAME=0 or NAME=1, got {spec!r}")
+        labels[name.strip().lower()] = int(value)
+
+    if args.command == "update":
+        classifier, featurizer, meta = load_model(args.model)
+        epochs = 1
+    else:
+        featurizer = StreamingTfidf(n_features=args.n_features, use_idf=args.idf)
+        classifier = SGDClassifier(loss='log_loss', alpha=args.alpha, random_state=42)
+        meta = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sklearn_version': sklearn.__version__,
+                'hyperparams': {'n_features': args.n_features, 'idf': args.idf, 'alpha': args.alpha,
+                                'validation_pct': args.validation_pct},
+                'n_trained': 0, 'history': []}
+        epochs = args.epochs
+        if args.input == '-' and epochs > 1:
+            parser.error("--epochs > 1 needs a file input")
+
+    started = time.perf_counter()
+    reservoir = ValidationReservoir(args.validation_size)
+    rejected = Counter()
+    trained = 0
+
+    def progress(done):
+        done += trained  # earlier epochs
+        rate = done / (time.perf_counter() - started)
+        print(f"[{time.strftime('%H:%M:%S')}] trained on {done:,} records ({rate:,.0f}/s)", file=sys.stderr)
+
+    for epoch in range(epochs):
+        records = read_labeled(args.input, args.format, args.text_field, args.label_field, labels,
+                               rejected if epoch == 0 else None)
+        # Only the first pass fills the reservoir and the IDF counts; later
+        # passes see the same records
+        trained += train_stream(records, classifier, featurizer, args.chunk_size, args.validation_pct,
+                                reservoir if epoch == 0 else None, on_chunk=progress,
+                                update_idf=epoch == 0)
+    if rejected:
+        print(f"[{time.strftime('%H:%M:%S')}] Skipped {sum(rejected.values()):,} records: "
+              f"{dict(rejected)}", file=sys.stderr)
+
+    metrics = evaluate(classifier, featurizer, reservoir, args.chunk_size)
+    meta['n_trained'] += trained
+    meta['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    meta['metrics'] = metrics
+    meta['history'].append({'command': args.command, 'input': args.input, 'records': trained,
+                            'rejected': sum(rejected.values()), 'epochs': epochs, 'at': meta['updated'], 'metrics': metrics})
+    save_model(args.model, classifier, featurizer, meta)
+    print(f"[{time.strftime('%H:%M:%S')}] {args.command}: {trained:,} records in "
+          f"{time.perf_counter() - started:.1f}s, validation {metrics}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # Run through the imported module so the pickled featurizer refers to
+    # fake_news_online.StreamingTfidf, not __main__, and loads elsewhere
+    import fake_news_online
+    fake_news_online.main()
@@ -0,0 +1,151 @@
+"""Compiled scorer for the fake-news TF-IDF + logistic-regression model.
+
+For one headline most of classify_news() is sklearn's per-call input
+validation and sparse-matrix construction, not the math. export() folds the
+fitted vectorizer and classifier into a single hashed table,
+term -> (idf, idf * coef), and CompiledScorer computes the same probability
+in plain Python:
+
+    x_t = count_t * idf_t                (TF-IDF of every term in the vocabulary)
+    z   = intercept + sum(x_t * coef_t) / ||x||_2
+    p   = 1 / (1 + exp(-z))             (probability of FAKE)
+
+Stop words and terms cut by max_df/max_features are simply absent from the
+table, so looking tokens up is the whole stop-word step. Loading the table
+needs neither NumPy nor sklearn.
+
+    python fake_news_scorer.py export                       # from the default trained model
+    python fake_news_scorer.py export --model models/x.joblib --out models/x.scorer.json
+    python fake_news_scorer.py check --out models/fake_news_scorer.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+FORMAT_VERSION = 1
+DEFAULT_PATH = os.path.join(
+    os.environ.get("FAKE_NEWS_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")),
+    "fake_news_scorer.json")
+
+
+def export(model, vectorizer, path):
+    """Writes the scorer table for a fitted TfidfVectorizer + binary linear
+    model. Raises ValueError for vectorizer settings it can't reproduce."""
+    if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'get_params'):
+        raise ValueError(f"can't compile {type(vectorizer).__name__}: needs a fitted TfidfVectorizer")
+    params = vectorizer.get_params()
+    required = {
+        'analyzer': 'word', 'ngram_range': (1, 1), 'norm': 'l2', 'sublinear_tf': False,
+        'binary': False, 'strip_accents': None, 'preprocessor': None, 'tokenizer': None,
+    }
+    for name, expected in required.items():
+        if params.get(name) != expected:
+            raise ValueError(f"can't compile vectorizer with {name}={params.get(name)!r}")
+    if not hasattr(vectorizer, 'idf_') or len(model.classes_) != 2:
+        raise ValueError("need a fitted TF-IDF vectorizer and a binary classifier")
+
+    idf = vectorizer.idf_ if params['use_idf'] else [1.0] * len(vectorizer.vocabulary_)
+    coef = model.coef_[0]
+    table = {term: [float(idf[i]), float(idf[i] * coef[i])] for term, i in vectorizer.vocabulary_.items()}
+    spec = {
+        'version': FORMAT_VERSION,
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': bool(params['lowercase']),
+        'intercept': float(model.intercept_[0]),
+        'classes': [int(c) for c in model.classes_],
+        'table': table,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w", encoding='utf-8') as f:
+        json.dump(spec, f, separators=(',', ':'))
+    os.replace(path + ".tmp", path)
+    return spec
+
+
+class CompiledScorer:
+    def __init__(self, spec):
+        if spec.get('version') != FORMAT_VERSION:
+            raise ValueError(f"unsupported scorer format {spec.get('version')!r}")
+        self.tokens = re.compile(spec['token_pattern']).findall
+        self.lowercase = spec['lowercase']
+        self.intercept = spec['intercept']
+        self.table = {term: tuple(entry) for term, entry in spec['table'].items()}
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def predict_proba(self, text):
+        """Probability that text is FAKE."""
+        table = self.table
+        norm_sq = dot = 0.0
+        for term, count in Counter(self.tokens(text.lower() if self.lowercase else text)).items():
+            entry = table.get(term)
+            if entry is not None:
+                idf, weight = entry
+                norm_sq += (count * idf) ** 2
+                dot += count * weight
+        z = self.intercept + (dot / math.sqrt(norm_sq) if norm_sq else 0.0)
+        # Split by sign so exp() can't overflow on extreme scores
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def classify(self, text):
+        """(label, confidence) exactly like fack_ditection.classify_news."""
+        p = self.predict_proba(text)
+        return ("FAKE", p * 100) if p >= 0.5 else ("REAL", (1 - p) * 100)
+
+    def classify_batch(self, texts):
+        return [self.classify(text) for text in texts]
+
+
+def _load_sklearn(model_path):
+    import fack_ditection
+    if model_path:
+        fack_ditection.MODEL_FILE = model_path
+    else:
+        fack_ditection.prepare_model(fack_ditection.create_mock_dataset())
+    return fack_ditection.get_model()
+
+
+def check(scorer, model, vectorizer, texts):
+    """Largest absolute difference from sklearn's FAKE probability."""
+    expected = model.predict_proba(vectorizer.transform(texts))[:, 1]
+    return max(abs(scorer.predict_proba(t) - float(p)) for t, p in zip(texts, expected))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model", metavar="PATH", help="saved (model, vectorizer) artifact; default trains/reuses the mock model")
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    # Training and dataset progress goes to stderr; stdout is the report
+    with contextlib.redirect_stdout(sys.stderr):
+        model, vectorizer = _load_sklearn(args.model)
+        import fack_ditection
+        texts = fack_ditection.create_mock_dataset()['text'].tolist()
+    if args.command == "export":
+        spec = export(model, vectorizer, args.out)
+        print(f"[{time.strftime('%H:%M:%S')}] Wrote {args.out}: {len(spec['table'])} terms, "
+              f"{os.path.getsize(args.out) / 1024:.0f} KiB")
+
+    worst = check(CompiledScorer.load(args.out), model, vectorizer, texts)
+    print(f"[{time.strftime('%H:%M:%S')}] Max |p - p_sklearn| over {len(texts)} texts: {worst:.3g}")
+    if worst > args.tolerance:
+        sys.exit(f"compiled scorer differs from sklearn by more than {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Local HTTP service for the fake-news classifier (stdlib asyncio only).
+
+Requests are queued and coalesced into micro-batches: the batcher takes
+what is waiting, up to --max-batch texts, waiting at most --max-wait-ms for
+more after the first, and classifies the whole batch with one
+vectorizer.transform + predict_proba call (fack_ditection.classify_batch)
+in a worker thread. Results are kept in a bounded LRU keyed by a hash of
+the normalized text, and identical texts already in flight share one
+prediction, so repeated wire stories never reach the model twice.
+
+    python fake_news_server.py --port 8080
+    python fake_news_server.py --model models/fake_news_online.joblib --max-batch 128 --max-wait-ms 5
+
+    curl -s localhost:8080/classify -d '{"text": "Scientists publish study"}'
+    curl -s localhost:8080/classify -d '{"texts": ["headline one", "headline two"]}'
+    curl -s localhost:8080/metrics
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter, OrderedDict, deque
+
+import numpy as np
+
+import fack_ditection
+
+MAX_BODY = 1 << 20
+LATENCY_WINDOW = 10000  # recent requests kept for the percentiles
+
+
+def text_key(text):
+    # Both vectorizers lowercase and split on word boundaries, so case and
+    # runs of whitespace can't change the prediction
+    normalized = ' '.join(text.lower().split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+
+class MicroBatcher:
+    """Coalesces classify() calls into batched model calls."""
+
+    def __init__(self, max_batch=64, max_wait_ms=2.0, cache_size=100000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = LRUCache(cache_size)
+        self.queue = asyncio.Queue()
+        self.inflight = {}  # text key -> future, for duplicates of queued texts
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def classify(self, texts):
+        """Returns [(label, confidence), ...] for texts."""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        waits = []
+        for text in texts:
+            key = text_key(text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                waits.append(cached)
+                continue
+            future = self.inflight.get(key)
+            if future is None:
+                future = loop.create_future()
+                self.inflight[key] = future
+                self.queue.put_nowait((key, text, future))
+            waits.append(future)
+        results = [w if isinstance(w, tuple) else await w for w in waits]
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - started)
+        return results
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            if self.queue.empty():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            self.batches += 1
+            self.batch_sizes[1 << (len(batch) - 1).bit_length()] += 1  # power-of-two buckets
+            try:
+                # One model call per batch, off the event loop
+                results = await asyncio.to_thread(fack_ditection.classify_batch, [t for _, t, _ in batch])
+            except Exception as e:
+                for key, _, future in batch:
+                    self.inflight.pop(key, None)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (key, _, future), result in zip(batch, results):
+                result = (result[0], round(result[1], 4))
+                self.cache.put(key, result)
+                self.inflight.pop(key, None)
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self):
+        lookups = self.cache.hits + self.cache.misses
+        latencies = np.array(self.latencies) * 1000
+        if len(latencies):
+            p50, p90, p99, top = np.percentile(latencies, [50, 90, 99, 100]).tolist()
+            latency = {'p50': p50, 'p90': p90, 'p99': p99, 'max': top, 'window': len(latencies)}
+        else:
+            latency = {}
+        return {
+            'requests': self.requests,
+            'queue_depth': self.queue.qsize(),
+            'inflight': len(self.inflight),
+            'batches': self.batches,
+            'batch_size_histogram': {f'<={size}': n for size, n in sorted(self.batch_sizes.items())},
+            'cache': {'size': len(self.cache.items), 'capacity': self.cache.size, 'hits': self.cache.hits,
+                      'misses': self.cache.misses,
+                      'hit_rate': self.cache.hits / lookups if lookups else 0.0},
+            'latency_ms': latency,
+        }
+
+
+# --- HTTP ---
+# A minimal HTTP/1.1 server with keep-alive: enough for JSON POSTs from
+# curl, load generators and other local services.
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def read_request(reader):
+    """Returns (method, path, headers, body), or None at end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise ValueError(413)
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                 f"Content-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+
+
+async def dispatch(batcher, method, path, body):
+    path = path.split('?', 1)[0]
+    if path == '/metrics':
+        return 200, batcher.metrics()
+    if path == '/health':
+        return 200, {'status': 'ok'}
+    if path != '/classify':
+        return 404, {'error': 'not found'}
+    if method != 'POST':
+        return 405, {'error': 'use POST'}
+    try:
+        request = json.loads(body)
+        single = 'text' in request
+        texts = [request['text']] if single else request['texts']
+        # A bare string is iterable too; it must not become one text per character
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return 400, {'error': 'expected {"text": str} or {"texts": [str, ...]}'}
+    results = [{'label': label, 'confidence': conf} for label, conf in await batcher.classify(texts)]
+    return 200, results[0] if single else {'results': results}
+
+
+# (body, expected status) pairs for --check
+CHECKS = [
+    (b'{"text": "Scientists publish study"}', 200),
+    (b'{"texts": ["headline one", "headline two"]}', 200),
+    (b'{"texts": []}', 200),
+    (b'{"texts": "abc"}', 400),
+    (b'{"texts": {"a": "b"}}', 400),
+    (b'{"texts": ["ok", 1]}', 400),
+    (b'{"text": ["abc"]}', 400),
+    (b'["abc"]', 400),
+    (b'not json', 400),
+]
+
+
+async def check(batcher):
+    """Runs CHECKS through dispatch(); returns the failures."""
+    batcher.start()
+    failures = []
+    for body, expected in CHECKS:
+        status, payload = await dispatch(batcher, 'POST', '/classify', body)
+        if status != expected:
+            failures.append(f"{body!r}: {status} {payload}, expected {expected}")
+    return failures
+
+
+async def handle_connection(batcher, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError as e:
+                status = e.args[0] if e.args and e.args[0] in REASONS else 400
+                write_response(writer, status, {'error': REASONS[status]}, False)
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                status, payload = await dispatch(batcher, method, path, body)
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+            write_response(writer, status, payload, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, batcher):
+    batcher.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(batcher, r, w), host, port)
+    addrs = ', '.join(str(s.getsockname()) for s in server.sockets)
+    print(f"[{time.strftime('%H:%M:%S')}] Serving on {addrs}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", metavar="PATH", help="saved (model, vectorizer) artifact to serve")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--cache-size", type=int, default=100000)
+    parser.add_argument("--check", action="store_true", help="check request validation and exit")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        fack_ditection.MODEL_FILE = args.model
+    else:
+        fack_ditection.prepare_model(fack_ditection.create_mock_dataset())
+    fack_ditection.get_model()  # load now rather than on the first request
+
+    batcher = MicroBatcher(args.max_batch, args.max_wait_ms, args.cache_size)
+    if args.check:
+        failures = asyncio.run(check(batcher))
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            raise SystemExit(1)
+        print(f"request check passed ({len(CHECKS)} requests)")
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, batcher))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,37 @@
+import argparse
+import time
 import tkinter as tk
-import random
-from datetime import datetime
-
-# --- CONFIGURATION CONSTANTS ---
-CANVAS_SIZE = 600
-ROAD_WIDTH = 60
-INTERSECTION_SIZE = 100
-
-# Traffic Light Timing (ms)
-BASE_GREEN_TIME = 10000  # 10 seconds for demo
-VEHICLE_BONUS_TIME = 2000
-YELLOW_TIME = 3000
-ALL_RED_TIME = 1000
-UPDATE_RATE_MS = 30
-
-# Car Movement
-CAR_SPEED = 3
-
-# Road mapping
-ROAD_PAIRS_MAP = {
-    'NS': ['north', 'south'],
-    'EW': ['east', 'west']
-}
+from traffic_sim import (TrafficSimulation, CANVAS_SIZE, ROAD_WIDTH, INTERSECTION_SIZE,
+                         UPDATE_RATE_MS)
+from traffic_trace import TraceReader, TraceRecorder
+from vehicle_store import EMERGENCY
+
+LIGHT_COLORS = {'red':'#ef4444','yellow':'#f59e0b','green':'#10b981'}
+EMERGENCY_COLORS = ('#ff0000', '#00bfff')
+BLINK_MS = 200           # emergency colour swap period, in simulated ms
+MAX_CATCHUP_TICKS = 10   # sim ticks per frame before the renderer gives up catching up
 
 class TrafficSimApp:
-    def __init__(self, master):
+    """Retained-mode Tk renderer for a TrafficSimulation.
+
+    Canvas items are created once and then only moved or recoloured when the
+    car they show changed; items of cars that left are hidden and reused.
+    When drawing falls behind, several sim ticks run per drawn frame.
+    """
+
+    def __init__(self, master, sim=None):
         self.master = master
         master.title("Smart Traffic Light Control System")
 
-        # --- State Variables ---
-        self.roads = ['north', 'east', 'south', 'west']
-        self.state = {r: {'vehicles': [], 'light': 'red'} for r in self.roads}
-        self.current_pair_name = 'NS'
-        self.manual_override = False
-        self.is_emergency_active = False
-        self.emergency_target_road = None
+        # --- Simulation ---
+        if sim is None:
+            sim = TrafficSimulation()
+            sim.populate_demo()
+        self.sim = sim
+        self.roads = sim.roads
+        self.cars = {}        # vehicle id -> [item, coords, fill] as last drawn
+        self.free_items = []  # hidden car items ready for reuse
+        self.lights_shown = {}
 
         # --- Setup GUI ---
         self.canvas = tk.Canvas(master, width=CANVAS_SIZE, height=CANVAS_SIZE, bg='#1a202c')
@@ -45,26 +42,23 @@ class TrafficSimApp:
         control_frame.pack(pady=10)
         for i, road in enumerate(self.roads):
             tk.Button(control_frame, text=f"{road.capitalize()} +1",
-                      command=lambda r=road: self.add_vehicle(r)).grid(row=0, column=i, padx=5)
-        tk.Button(control_frame, text="🚨 Emergency", bg='red', fg='white', command=self.toggle_emergency).grid(row=1, columnspan=4, pady=5)
+                      command=lambda r=road: self.sim.add_vehicle(r)).grid(row=0, column=i, padx=5)
+        tk.Button(control_frame, text="🚨 Emergency", bg='red', fg='white', command=self.sim.toggle_emergency).grid(row=1, columnspan=4, pady=5)
 
         # Status
-        self.status_label = tk.Label(master, text="Initializing...")
+        self.status_label = tk.Label(master, text=self.sim.status)
         self.status_label.pack()
 
-        # Initialize cars for demo
-        for road in self.roads:
-            for _ in range(random.randint(1, 3)):
-                self.add_vehicle(road)
-
         # Start simulation
         self.draw_road()
-        self.master.after(UPDATE_RATE_MS, self.update_cars)
-        self.master.after(100, self.traffic_cycle)
+        self.next_frame_at = time.perf_counter() * 1000 + UPDATE_RATE_MS
+        self.master.after(UPDATE_RATE_MS, self.update)
 
     # --- DRAW METHODS ---
     def draw_road(self):
         self.canvas.delete("all")
+        self.cars = {}
+        self.free_items = []
         half = CANVAS_SIZE / 2
         int_top = half - INTERSECTION_SIZE / 2
         int_bottom = half + INTERSECTION_SIZE / 2
@@ -94,137 +88,105 @@ class TrafficSimApp:
         half = CANVAS_SIZE / 2
         size = INTERSECTION_SIZE / 2 + 10
         radius = 8
-        light_map = {'red':'#ef4444','yellow':'#f59e0b','green':'#10b981'}
-
-        self.canvas.create_oval(half-15-radius, half-size-radius, half-15+radius, half-size+radius,
-                                fill=light_map[self.state['north']['light']], tags='light_north')
-        self.canvas.create_oval(half+15-radius, half+size-radius, half+15+radius, half+size+radius,
-                                fill=light_map[self.state['south']['light']], tags='light_south')
-        self.canvas.create_oval(half+size-radius, half-15-radius, half+size+radius, half-15+radius,
-                                fill=light_map[self.state['east']['light']], tags='light_east')
-        self.canvas.create_oval(half-size-radius, half+15-radius, half-size+radius, half+15+radius,
-                                fill=light_map[self.state['west']['light']], tags='light_west')
+        centers = {
+            'north': (half-15, half-size),
+            'south': (half+15, half+size),
+            'east': (half+size, half-15),
+            'west': (half-size, half+15),
+        }
+        for road, (cx, cy) in centers.items():
+            light = self.sim.state[road]['light']
+            self.canvas.create_oval(cx-radius, cy-radius, cx+radius, cy+radius,
+                                    fill=LIGHT_COLORS[light], tags=f'light_{road}')
+            self.lights_shown[road] = light
 
     def draw_cars(self):
-        for road in self.roads:
-            for car in self.state[road]['vehicles']:
-                if car['id']:
-                    self.canvas.delete(car['id'])
-                fill_color = car['color']
-                if car.get('is_emergency', False):
-                    if (datetime.now().microsecond // 200000) % 2 == 0:
-                        fill_color = '#ff0000'
+        canvas = self.canvas
+        # One blink phase for every emergency vehicle, off the simulated clock
+        blink = EMERGENCY_COLORS[(self.sim.time_ms // BLINK_MS) % 2]
+        seen = set()
+        for lane in self.sim.lanes.values():
+            n = len(lane)
+            if not n:
+                continue
+            x0, y0, x1, y1 = (a.tolist() for a in lane.rects())
+            live = lane.live
+            vids = lane.vid[live].tolist()
+            flags = lane.flags[live].tolist()
+            colors = lane.color[live].tolist()
+            for i, vid in enumerate(vids):
+                seen.add(vid)
+                coords = (x0[i], y0[i], x1[i], y1[i])
+                fill = blink if flags[i] & EMERGENCY else f'#{colors[i]:06x}'
+                car = self.cars.get(vid)
+                if car is None:
+                    if self.free_items:
+                        item = self.free_items.pop()
+                        canvas.coords(item, *coords)
+                        canvas.itemconfig(item, fill=fill, state='normal')
                     else:
-                        fill_color = '#00bfff'
-                car_id = self.canvas.create_rectangle(car['x'], car['y'], car['x']+car['width'], car['y']+car['height'],
-                                                      fill=fill_color, tags=car['tag'])
-                car['id'] = car_id
-
-    # --- VEHICLE LOGIC ---
-    def add_vehicle(self, road, is_emergency=False):
-        half = CANVAS_SIZE/2
-        lane_offset = ROAD_WIDTH/2 - 15
-        width, height = (15, 25) if road in ['north','south'] else (25,15)
-        if road == 'north':
-            x = half + lane_offset - width/2
-            y = -height if not self.state[road]['vehicles'] else self.state[road]['vehicles'][-1]['y'] - height -5
-        elif road == 'south':
-            x = half - lane_offset - width/2
-            y = CANVAS_SIZE if not self.state[road]['vehicles'] else self.state[road]['vehicles'][-1]['y'] + height +5
-        elif road == 'east':
-            x = CANVAS_SIZE if not self.state[road]['vehicles'] else self.state[road]['vehicles'][-1]['x'] + width +5
-            y = half + lane_offset - height/2
-        elif road == 'west':
-            x = -width if not self.state[road]['vehicles'] else self.state[road]['vehicles'][-1]['x'] - width -5
-            y = half - lane_offset - height/2
-
-        car = {'road':road, 'x':x, 'y':y, 'width':width, 'height':height,
-               'color':f'#{random.randint(0,0xFFFFFF):06x}', 'tag':f"car_{road}_{len(self.state[road]['vehicles'])}",
-               'id':None, 'is_emergency':is_emergency, 'stopped':False}
-        self.state[road]['vehicles'].append(car)
-
-    def update_cars(self):
-        half = CANVAS_SIZE/2
-        stop_line = INTERSECTION_SIZE/2
+                        item = canvas.create_rectangle(*coords, fill=fill, tags='car')
+                    self.cars[vid] = [item, coords, fill]
+                    continue
+                if coords != car[1]:
+                    canvas.coords(car[0], *coords)
+                    car[1] = coords
+                if fill != car[2]:
+                    canvas.itemconfig(car[0], fill=fill)
+                    car[2] = fill
+        if len(seen) != len(self.cars):
+            for vid in [v for v in self.cars if v not in seen]:
+                item = self.cars.pop(vid)[0]
+                canvas.itemconfig(item, state='hidden')
+                self.free_items.append(item)
+
+    def set_lights(self):
         for road in self.roads:
-            for car in self.state[road]['vehicles'][:]:
-                # Determine light and movement
-                current_light = self.state[road]['light']
-                moving = current_light=='green' or car['is_emergency']
-
-                if moving:
-                    if road=='north':
-                        car['y'] += CAR_SPEED
-                    elif road=='south':
-                        car['y'] -= CAR_SPEED
-                    elif road=='east':
-                        car['x'] -= CAR_SPEED
-                    elif road=='west':
-                        car['x'] += CAR_SPEED
-
-                # Remove off-screen cars
-                off_screen = ((road=='north' and car['y']>CANVAS_SIZE) or
-                              (road=='south' and car['y']+car['height']<0) or
-                              (road=='east' and car['x']+car['width']<0) or
-                              (road=='west' and car['x']>CANVAS_SIZE))
-                if off_screen:
-                    if car['id']:
-                        self.canvas.delete(car['id'])
-                    self.state[road]['vehicles'].remove(car)
-
+            light = self.sim.state[road]['light']
+            if self.lights_shown.get(road) != light:
+                self.canvas.itemconfig(f"light_{road}", fill=LIGHT_COLORS[light])
+                self.lights_shown[road] = light
+
+    # --- SIMULATION LOOP ---
+    def update(self):
+        # Frame decimation: if drawing fell behind, step the sim for every
+        # tick that was due and draw only the latest state.
+        now = time.perf_counter() * 1000
+        behind = max(0, int((now - self.next_frame_at) // UPDATE_RATE_MS))
+        ticks = 1 + min(behind, MAX_CATCHUP_TICKS - 1)
+        self.sim.step(ticks)
+        self.next_frame_at += ticks * UPDATE_RATE_MS
+        if behind >= MAX_CATCHUP_TICKS:
+            # Too far behind to catch up; let the simulation run slower instead
+            self.next_frame_at = now + UPDATE_RATE_MS
+
+        self.set_lights()
         self.draw_cars()
-        self.master.after(UPDATE_RATE_MS, self.update_cars)
-
-    # --- TRAFFIC LIGHT LOGIC ---
-    def set_lights(self, road1, road2, color):
-        self.state[road1]['light'] = color
-        self.state[road2]['light'] = color
-        for road in [road1, road2]:
-            self.canvas.itemconfig(f"light_{road}", fill={'red':'#ef4444','yellow':'#f59e0b','green':'#10b981'}[color])
-
-    def traffic_cycle(self):
-        if self.manual_override:
-            self.status_label.config(text=f"Manual Override ({self.current_pair_name})")
-            self.master.after(1000, self.traffic_cycle)
-            return
-
-        # Adaptive logic
-        ns_count = len(self.state['north']['vehicles']) + len(self.state['south']['vehicles'])
-        ew_count = len(self.state['east']['vehicles']) + len(self.state['west']['vehicles'])
-        next_pair = 'NS' if ns_count>=ew_count else 'EW'
-        road1, road2 = ROAD_PAIRS_MAP[next_pair]
-        duration = BASE_GREEN_TIME + max(ns_count, ew_count)*VEHICLE_BONUS_TIME
-
-        # Emergency override
-        if self.is_emergency_active and self.emergency_target_road:
-            next_pair = 'NS' if self.emergency_target_road in ['north','south'] else 'EW'
-            road1, road2 = ROAD_PAIRS_MAP[next_pair]
-            duration *= 1.5
-            self.is_emergency_active = False
-
-        self.current_pair_name = next_pair
-        self.set_lights(road1, road2, 'green')
-        self.status_label.config(text=f"{road1.upper()}/{road2.upper()} GREEN for {duration//1000}s")
-
-        self.master.after(duration, lambda: self._end_green_phase(road1, road2))
-
-    def _end_green_phase(self, road1, road2):
-        self.set_lights(road1, road2, 'yellow')
-        self.master.after(YELLOW_TIME, lambda: self.set_lights(road1, road2, 'red'))
-        self.master.after(YELLOW_TIME+ALL_RED_TIME, self.traffic_cycle)
-
-    # --- EMERGENCY OVERRIDE ---
-    def toggle_emergency(self):
-        self.is_emergency_active = True
-        # Pick the road with most stopped cars
-        counts = {r: len(self.state[r]['vehicles']) for r in self.roads}
-        self.emergency_target_road = max(counts, key=counts.get)
-        # Mark first car as emergency
-        for car in self.state[self.emergency_target_road]['vehicles']:
-            car['is_emergency'] = True
-            break
+        if self.status_label.cget('text') != self.sim.status:
+            self.status_label.config(text=self.sim.status)
+        delay = self.next_frame_at - time.perf_counter() * 1000
+        self.master.after(max(1, int(delay)), self.update)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Traffic Light Control System")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--record", metavar="TRACE", help="record the run to a trace file")
+    parser.add_argument("--replay", metavar="TRACE", help="re-run a recorded trace")
+    args = parser.parse_args()
+
+    recorder = None
+    if args.replay:
+        sim = TraceReader(args.replay).rerun_sim()
+    else:
+        sim = TrafficSimulation(seed=args.seed)
+        if args.record:
+            recorder = TraceRecorder(args.record, sim)
+        sim.populate_demo()
+
     root = tk.Tk()
-    app = TrafficSimApp(root)
-    root.mainloop()
+    app = TrafficSimApp(root, sim)
+    try:
+        root.mainloop()
+    finally:
+        if recorder:
+            recorder.close()
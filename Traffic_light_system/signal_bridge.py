@@ -0,0 +1,525 @@
+"""Serial bridge from the Python signal controller to the light hardware.
+
+Frames on the wire (see ardino.cpp for the firmware side):
+
+    0xA5 | type | seq | len | payload (len bytes) | CRC-16/CCITT (big-endian)
+
+The CRC covers type, seq, len and the payload. The host sends
+PHASE(head, light, hold_ms) and PING, and the board answers every valid
+frame with ACK(seq) or, on a bad CRC, NAK. If the board gets no valid PHASE
+for hold_ms it falls back to its own fixed cycle, so a dead host never
+leaves a junction stuck on green.
+
+SignalBridge never blocks the caller. send_light() only records the
+wanted light per head, so a newer command replaces one that hasn't been
+sent yet. An I/O thread writes everything pending in one os.write() per
+batch interval, retransmits frames that weren't acked in time, and keeps
+ack/latency metrics. A PHASE that runs out of retries is sent again as a
+new command until the board acks the requested light; until then
+mismatches() reports the head.
+
+LoopbackEmulator plays the board on a pty, so the whole path can be run
+without hardware:
+
+    python signal_bridge.py --loopback --seconds 30
+    python signal_bridge.py --port /dev/ttyACM0 --baud 115200
+"""
+import argparse
+import os
+import pty
+import selectors
+import struct
+import termios
+import threading
+import time
+import tty
+from collections import deque
+
+SYNC = 0xA5
+PHASE, PING, ACK, NAK = 0x01, 0x02, 0x81, 0x82
+LIGHT_CODES = {'red': 0, 'yellow': 1, 'green': 2, 'off': 3}
+LIGHT_NAMES = {v: k for k, v in LIGHT_CODES.items()}
+MAX_PAYLOAD = 32
+BAUD_RATES = {9600: termios.B9600, 19200: termios.B19200, 38400: termios.B38400,
+              57600: termios.B57600, 115200: termios.B115200}
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE, table driven."""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def encode_frame(kind, seq, payload=b""):
+    body = bytes((kind, seq & 0xFF, len(payload))) + payload
+    return bytes((SYNC,)) + body + struct.pack(">H", crc16(body))
+
+
+def phase_payload(head, light, hold_ms):
+    return struct.pack(">BBH", head, LIGHT_CODES[light], min(hold_ms, 0xFFFF))
+
+
+class FrameDecoder:
+    """Incremental decoder: feed() bytes, get back complete (kind, seq, payload)
+    frames. Garbage and frames with a bad CRC are skipped and counted; a bad
+    frame resyncs on the next SYNC byte."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.bad_crc = 0
+
+    def feed(self, data):
+        self.buf += data
+        frames = []
+        buf = self.buf
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                buf.clear()
+                break
+            if start:
+                del buf[:start]
+            if len(buf) < 4:
+                break
+            length = buf[3]
+            if length > MAX_PAYLOAD:
+                del buf[:1]
+                continue
+            end = 4 + length + 2
+            if len(buf) < end:
+                break
+            body = bytes(buf[1:4 + length])
+            if struct.unpack(">H", buf[4 + length:end])[0] == crc16(body):
+                frames.append((body[0], body[1], body[3:]))
+                del buf[:end]
+            else:
+                self.bad_crc += 1
+                del buf[:1]
+        return frames
+
+
+def open_serial(path, baud=115200):
+    """Opens a tty raw and non-blocking, without pyserial."""
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    speed = BAUD_RATES[baud]
+    attrs[4] = attrs[5] = speed
+    attrs[2] |= termios.CLOCAL | termios.CREAD
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    return fd
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+class SignalBridge:
+    def __init__(self, fd, batch_ms=5, ack_timeout_ms=200, retries=3, hold_ms=5000,
+                 ping_ms=1000, owns_fd=True):
+        self.fd = fd
+        self.owns_fd = owns_fd
+        self.batch_s = batch_ms / 1000
+        self.ack_timeout_s = ack_timeout_ms / 1000
+        self.retries = retries
+        self.hold_ms = hold_ms
+        self.ping_s = ping_ms / 1000
+        self.decoder = FrameDecoder()
+
+        self._lock = threading.Lock()
+        self._wanted = {}         # head -> light not yet sent (coalesced)
+        self._requested = {}      # head -> light last asked for; refreshed until acked
+        self._applied = {}        # head -> light last acked
+        self._failing = set()     # heads whose requested light ran out of retries
+        self._inflight = {}       # seq -> [frame, first_sent, last_sent, tries, head, light]
+        self._seq = 0
+        self._last_phase = {}     # head -> time of last PHASE, to refresh before hold_ms runs out
+        self._latencies = deque(maxlen=4096)
+        self.metrics = {'queued': 0, 'coalesced': 0, 'commands': 0, 'frames': 0, 'acked': 0, 'nak': 0,
+                        'retransmits': 0, 'superseded': 0, 'failed': 0, 'batches': 0, 'bytes_out': 0}
+
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._thread = threading.Thread(target=self._run, name="signal-bridge", daemon=True)
+        self._thread.start()
+
+    # --- Caller side (never blocks on I/O) ---
+    def send_light(self, head, light):
+        with self._lock:
+            if head in self._wanted:
+                self.metrics['coalesced'] += 1
+            self._wanted[head] = light
+            self._requested[head] = light
+            self.metrics['queued'] += 1
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def queue_depth(self):
+        with self._lock:
+            return len(self._wanted) + len(self._inflight)
+
+    def mismatches(self):
+        """{head: (requested light, last acked light)} for heads whose
+        requested light failed and hasn't been acked since."""
+        with self._lock:
+            return {head: (self._requested[head], self._applied.get(head)) for head in self._failing}
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.metrics)
+            stats['inflight'] = len(self._inflight)
+            stats['pending'] = len(self._wanted)
+            stats['mismatched'] = len(self._failing)
+            stats['bad_crc_in'] = self.decoder.bad_crc
+        for pct in (50, 95, 99):
+            value = _percentile(latencies, pct)
+            stats[f'ack_p{pct}_ms'] = round(value * 1000, 3) if value is not None else None
+        stats['ack_rate'] = round(stats['acked'] / stats['commands'], 4) if stats['commands'] else None
+        return stats
+
+    def close(self):
+        self._stop.set()
+        os.write(self._wake_w, b"\0")
+        self._thread.join()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        if self.owns_fd:
+            os.close(self.fd)
+
+    # --- I/O thread ---
+    def _next_seq(self):
+        # 1..255; 0 is what NAKs carry, since a corrupt frame's seq can't be trusted
+        self._seq = self._seq % 255 + 1
+        return self._seq
+
+    def _collect(self, now):
+        """Frames to write this batch: new commands, refreshes and retries."""
+        out = []
+        with self._lock:
+            for seq, entry in list(self._inflight.items()):
+                if now - entry[2] < self.ack_timeout_s:
+                    continue
+                if entry[3] > self.retries:
+                    # A failed PHASE leaves the head out of step with what was
+                    # requested; the refresh below sends it again
+                    del self._inflight[seq]
+                    self.metrics['failed'] += 1
+                    if entry[4] is not None:
+                        self._failing.add(entry[4])
+                    continue
+                entry[2] = now
+                entry[3] += 1
+                self.metrics['retransmits'] += 1
+                out.append(entry[0])
+            wanted, self._wanted = self._wanted, {}
+            # Re-send the requested light if it was never acked, or well
+            # before the board's hold runs out
+            sending = {entry[4] for entry in self._inflight.values()}
+            for head, light in self._requested.items():
+                if head in wanted or head in sending:
+                    continue
+                if self._applied.get(head) != light or now - self._last_phase.get(head, 0) > self.hold_ms / 2000:
+                    wanted[head] = light
+            if wanted:
+                # A newer light supersedes any unacked one for the same head;
+                # retrying the old one could land after it and undo it
+                for seq, entry in list(self._inflight.items()):
+                    if entry[4] in wanted:
+                        del self._inflight[seq]
+                        self.metrics['superseded'] += 1
+            for head, light in wanted.items():
+                seq = self._next_seq()
+                frame = encode_frame(PHASE, seq, phase_payload(head, light, self.hold_ms))
+                self._inflight[seq] = [frame, now, now, 1, head, light]
+                self._last_phase[head] = now
+                self.metrics['commands'] += 1
+                out.append(frame)
+            if not out and now - max(self._last_phase.values(), default=0) > self.ping_s:
+                seq = self._next_seq()
+                frame = encode_frame(PING, seq)
+                self._inflight[seq] = [frame, now, now, 1, None, None]
+                self._last_phase[None] = now
+                self.metrics['commands'] += 1
+                out.append(frame)
+            self.metrics['frames'] += len(out)
+        return out
+
+    def _handle(self, frames, now):
+        with self._lock:
+            for kind, seq, _ in frames:
+                if kind == NAK:
+                    # The board couldn't read which frame it was (NAKs carry
+                    # seq 0), so everything unacked goes out again next batch
+                    self.metrics['nak'] += 1
+                    for entry in self._inflight.values():
+                        entry[2] = 0
+                    continue
+                entry = self._inflight.get(seq)
+                if entry is None or kind != ACK:
+                    continue
+                del self._inflight[seq]
+                self.metrics['acked'] += 1
+                self._latencies.append(now - entry[1])  # including any retries
+                if entry[4] is not None:
+                    self._applied[entry[4]] = entry[5]
+                    if self._requested.get(entry[4]) == entry[5]:
+                        self._failing.discard(entry[4])
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.fd, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        pending_out = b""
+        next_batch = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            timeout = max(0.0, next_batch - now)
+            for key, _ in sel.select(timeout):
+                if key.fd == self._wake_r:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    data = os.read(self.fd, 4096)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    self._stop.set()
+                    break
+                self._handle(self.decoder.feed(data), time.monotonic())
+
+            now = time.monotonic()
+            if now >= next_batch:
+                next_batch = now + self.batch_s
+                frames = self._collect(now)
+                if frames:
+                    pending_out += b"".join(frames)
+                    with self._lock:
+                        self.metrics['batches'] += 1
+                if pending_out:
+                    try:
+                        written = os.write(self.fd, pending_out)
+                    except BlockingIOError:
+                        written = 0
+                    except OSError:
+                        break
+                    pending_out = pending_out[written:]
+                    with self._lock:
+                        self.metrics['bytes_out'] += written
+        sel.close()
+
+
+class SimSignalObserver:
+    """TrafficSimulation observer forwarding light changes to a bridge.
+    Head numbers follow ROADS order unless a {road: head} map is given.
+
+    shown is what the simulation asked for; mismatched holds the roads
+    whose light the board failed to take, as {road: (wanted, on the board)}
+    with None for a head the board never acked."""
+
+    def __init__(self, bridge, roads, heads=None):
+        self.bridge = bridge
+        self.heads = heads or {road: i for i, road in enumerate(roads)}
+        self.roads = {head: road for road, head in self.heads.items()}
+        self.shown = {}
+        self.mismatched = {}
+
+    def on_input(self, sim, kind, args):
+        pass
+
+    def on_tick(self, sim):
+        for road, head in self.heads.items():
+            light = sim.state[road]['light']
+            if self.shown.get(road) != light:
+                self.shown[road] = light
+                self.bridge.send_light(head, light)
+        self.mismatched = {self.roads[head]: lights for head, lights in self.bridge.mismatches().items()
+                           if head in self.roads}
+
+
+class LoopbackEmulator:
+    """Stands in for the board on a pty: applies PHASE frames to virtual
+    lights and acks every valid frame. latency_ms delays each reply and
+    corrupt_every garbles every Nth read from the pty, to exercise retries;
+    while nak_phase is set, PHASE frames are NAKed instead of applied.
+    phases logs every (head, light) PHASE received, applied or not."""
+
+    def __init__(self, latency_ms=2, corrupt_every=0, nak_phase=False):
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave  # kept open so the pty stays up
+        os.set_blocking(self.master, False)
+        self.latency_s = latency_ms / 1000
+        self.corrupt_every = corrupt_every
+        self.nak_phase = nak_phase
+        self.lights = {}
+        self.phases = []
+        self.received = 0
+        self.reads = 0  # drives corrupt_every; counts reads, decoded or not
+        self.decoder = FrameDecoder()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="signal-loopback", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.master, selectors.EVENT_READ)
+        while not self._stop.is_set():
+            if not sel.select(0.05):
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                break
+            bad_before = self.decoder.bad_crc
+            self.reads += 1
+            if self.corrupt_every and self.reads % self.corrupt_every == 0:
+                data = bytes([data[0]]) + bytes(b ^ 0x55 for b in data[1:2]) + data[2:]
+            replies = []
+            for kind, seq, payload in self.decoder.feed(data):
+                self.received += 1
+                if kind == PHASE and len(payload) == 4:
+                    head, light, _ = struct.unpack(">BBH", payload)
+                    self.phases.append((head, LIGHT_NAMES.get(light, 'off')))
+                    if self.nak_phase:
+                        replies.append(encode_frame(NAK, 0))
+                        continue
+                    self.lights[head] = LIGHT_NAMES.get(light, 'off')
+                replies.append(encode_frame(ACK, seq))
+            for _ in range(self.decoder.bad_crc - bad_before):
+                replies.append(encode_frame(NAK, 0))
+            if replies:
+                if self.latency_s:
+                    time.sleep(self.latency_s)
+                os.write(self.master, b"".join(replies))
+        sel.close()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master)
+        os.close(self._slave)
+
+
+def check_failed_phase(timeout_s=2.0):
+    """Loopback check: with every PHASE NAKed, a failed command must be
+    reported and the refresh must keep sending the requested light, not the
+    last acked one; once the board acks again it must end on that light.
+    Returns a list of problems, empty if it passed."""
+    problems = []
+    emulator = LoopbackEmulator(latency_ms=0)
+    bridge = SignalBridge(open_serial(emulator.port), ack_timeout_ms=20, retries=1, hold_ms=200)
+    try:
+        def wait_for(condition):
+            deadline = time.monotonic() + timeout_s
+            while not condition() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return condition()
+
+        bridge.send_light(0, 'red')
+        if not wait_for(lambda: emulator.lights.get(0) == 'red'):
+            problems.append("board never showed the first light")
+        emulator.nak_phase = True
+        seen = len(emulator.phases)
+        bridge.send_light(0, 'green')
+        if not wait_for(lambda: bridge.mismatches() == {0: ('green', 'red')}):
+            problems.append(f"failed PHASE not reported: {bridge.mismatches()}")
+        time.sleep(0.3)  # past hold_ms / 2, so a refresh is due too
+        sent = emulator.phases[seen:]
+        if (0, 'red') in sent:
+            problems.append("refresh re-sent the last acked light instead of the requested one")
+        if sent.count((0, 'green')) <= 2:  # the first send and its one retry
+            problems.append(f"requested light not sent again after failing: {sent}")
+        emulator.nak_phase = False
+        if not wait_for(lambda: emulator.lights.get(0) == 'green' and not bridge.mismatches()):
+            problems.append(f"board ended on {emulator.lights.get(0)}, mismatches {bridge.mismatches()}")
+    finally:
+        bridge.close()
+        emulator.close()
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive signal hardware from the simulation")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="serial device of the board")
+    target.add_argument("--loopback", action="store_true", help="use the pty board emulator")
+    target.add_argument("--check", action="store_true",
+                        help="run the failed-command check on the pty emulator and exit")
+    parser.add_argument("--baud", type=int, default=115200, choices=sorted(BAUD_RATES))
+    parser.add_argument("--seconds", type=float, default=30.0, help="wall-clock run time")
+    parser.add_argument("--speedup", type=float, default=1.0, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = check_failed_phase()
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            raise SystemExit(1)
+        print("failed-command check passed")
+        return
+
+    from traffic_sim import ROADS, TrafficSimulation
+
+    emulator = None
+    if args.loopback:
+        emulator = LoopbackEmulator()
+        port = emulator.port
+    else:
+        port = args.port
+    bridge = SignalBridge(open_serial(port, args.baud))
+    sim = TrafficSimulation(seed=args.seed, arrival_rates={r: 0.2 for r in ROADS})
+    observer = SimSignalObserver(bridge, sim.roads)
+    sim.observers.append(observer)
+    sim.populate_demo()
+
+    started = time.monotonic()
+    slowest_step = 0.0
+    try:
+        while time.monotonic() - started < args.seconds:
+            t0 = time.perf_counter()
+            sim.step()
+            slowest_step = max(slowest_step, time.perf_counter() - t0)
+            time.sleep(max(0.0, sim.dt_ms / 1000 / args.speedup - (time.perf_counter() - t0)))
+    finally:
+        time.sleep(0.5)  # let the last acks come in
+        stats = bridge.snapshot()
+        bridge.close()
+        if emulator:
+            print(f"board lights: {emulator.lights}")
+            emulator.close()
+    if observer.mismatched:
+        print(f"board behind the simulation: {observer.mismatched}")
+    stats['slowest_sim_step_ms'] = round(slowest_step * 1000, 3)
+    print(f"bridge: {stats}")
+
+
+if __name__ == "__main__":
+    main()
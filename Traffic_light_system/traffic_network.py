@@ -0,0 +1,495 @@
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import random
+import time
+from collections import deque
+
+from traffic_controllers import HeuristicController, make_controller
+from traffic_sim import (ROAD_PAIRS_MAP, UPDATE_RATE_MS, FIRST_CYCLE_MS, OVERRIDE_RECHECK_MS,
+                         RATE_TAU_MS, SignalTiming)
+
+# --- Road network ---
+# A network of signalized intersections joined by links. Each intersection
+# keeps the single-intersection app's per-road state (light + waiting cars)
+# and its adaptive cycle, but cars are queue entries rather than pixels:
+# a green approach discharges one car per SATURATION_HEADWAY_MS, and a car
+# leaving an approach drives straight on, reaching the next intersection
+# after the link's travel time (or leaving the network at the edge).
+#
+# Large networks are split into partitions stepped in parallel by worker
+# processes. Partitions only exchange the cars crossing between them, in
+# one batch per window; a window is as long as the shortest link, so a car
+# leaving during a window can never be due at its next intersection before
+# the window ends (conservative lookahead).
+#
+# Controllers that look downstream (max-pressure) read a snapshot of the
+# next intersection's queues taken at the start of each window. Snapshots of
+# intersections in other partitions travel with the window's car exchange,
+# and windows are counted from tick 0 whatever the partitioning, so a run
+# gives the same results with any number of workers.
+
+SATURATION_HEADWAY_MS = 2000
+OPPOSITE = {'north': 'south', 'south': 'north', 'east': 'west', 'west': 'east'}
+# Grid neighbour offsets (row, col) for a car heading that way
+HEADING_STEP = {'north': (-1, 0), 'south': (1, 0), 'east': (0, 1), 'west': (0, -1)}
+
+
+def grid_config(rows, cols, travel_ms=8000, arrival_rate=0.1, timing=None):
+    """Network config for a rows x cols grid with two-way streets and
+    traffic entering on every edge approach."""
+    def iid(r, c):
+        return f"r{r}c{c}"
+
+    config = {"intersections": [], "links": [], "sources": []}
+    if timing:
+        config["timing"] = timing
+    for r in range(rows):
+        for c in range(cols):
+            config["intersections"].append({"id": iid(r, c)})
+            for heading, (dr, dc) in HEADING_STEP.items():
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols:
+                    config["links"].append({"from": iid(r, c), "to": iid(nr, nc),
+                                            "heading": heading, "travel_ms": travel_ms})
+                else:
+                    # No neighbour that way, so cars come in from there
+                    config["sources"].append({"at": iid(r, c), "road": heading, "rate": arrival_rate})
+    return config
+
+
+def load_config(path):
+    """Reads a network config (JSON). {"grid": {...}} expands to grid_config()."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    if "grid" in config:
+        grid = dict(config.pop("grid"))
+        expanded = grid_config(grid.pop("rows"), grid.pop("cols"), timing=config.get("timing"), **grid)
+        config = {**expanded, **config}
+    return config
+
+
+def partition(config, parts):
+    """Maps intersection id -> partition number.
+
+    Explicit "partition" fields in the config win; otherwise intersections
+    are ordered breadth-first along the links and cut into equal contiguous
+    chunks, which keeps most links inside one partition.
+    """
+    ids = [i["id"] for i in config["intersections"]]
+    explicit = {i["id"]: i["partition"] for i in config["intersections"] if "partition" in i}
+    if len(explicit) == len(ids):
+        return explicit
+    neighbours = {i: [] for i in ids}
+    for link in config["links"]:
+        neighbours[link["from"]].append(link["to"])
+        neighbours[link["to"]].append(link["from"])
+    order, seen = [], set()
+    for start in ids:
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for nxt in neighbours[node]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+    parts = max(1, min(parts, len(order)))
+    size = -(-len(order) // parts)
+    return {node: n // size for n, node in enumerate(order)}
+
+
+class Intersection:
+    """One signalized intersection: per-road queues and the adaptive cycle."""
+
+    def __init__(self, iid, seed, timing=None, pairs=None, arrival_rates=None,
+                 headway_ms=SATURATION_HEADWAY_MS, controller=None):
+        self.id = iid
+        # Seeded per intersection, so a run doesn't depend on how it's partitioned
+        self.rng = random.Random(f"{seed}:{iid}")
+        self.timing = timing or SignalTiming()
+        self.pairs = pairs or ROAD_PAIRS_MAP
+        self.roads = [r for pair in self.pairs.values() for r in pair]
+        self.arrival_rates = dict(arrival_rates or {})
+        self.headway_ms = headway_ms
+        self.state = {r: {'light': 'red', 'queue': deque(), 'next_discharge': 0} for r in self.roads}
+        self.exits = {}    # road -> (next intersection id, travel_ms)
+        self.downstream = {}  # road -> queue snapshot of the next intersection
+        self.inbound = []  # heap of (due_ms, seq, road, car)
+        self._seq = 0
+        self._next_vid = 0
+
+        self.controller = controller or HeuristicController()
+        self.queues = {r: 0 for r in self.roads}
+        self.rates = {r: 0.0 for r in self.roads}
+        self._arrivals = {r: 0 for r in self.roads}
+        self.time_ms = 0
+        self.green_started_at = None
+
+        self.current_pair_name = next(iter(self.pairs))
+        self.manual_override = False
+        self.is_emergency_active = False
+        self.emergency_target_road = None
+        self.phase = 'start'
+        self.phase_ends_at = FIRST_CYCLE_MS
+        self.green_pair = None
+
+        self.stats = {'spawned': 0, 'served': 0, 'exited': 0, 'wait_ms': 0, 'cycles': 0}
+
+    # --- VEHICLE LOGIC ---
+    def add_vehicle(self, road, now_ms, is_emergency=False):
+        vid = f"{self.id}#{self._next_vid}"
+        self._next_vid += 1
+        self.stats['spawned'] += 1
+        self._enqueue(road, [vid, now_ms, is_emergency])
+
+    def receive(self, due_ms, road, car):
+        self._seq += 1
+        heapq.heappush(self.inbound, (due_ms, self._seq, road, car))
+
+    def _enqueue(self, road, car):
+        self.state[road]['queue'].append(car)
+        self.queues[road] += 1
+        self._arrivals[road] += 1
+        if car[2]:
+            self.is_emergency_active = True
+            self.emergency_target_road = road
+
+    def _discharge(self, now_ms, dt_ms, outbound):
+        while self.inbound and self.inbound[0][0] <= now_ms:
+            due, _, road, car = heapq.heappop(self.inbound)
+            car[1] = due  # starts waiting on arrival
+            self._enqueue(road, car)
+        for road, rate in self.arrival_rates.items():
+            if rate and self.rng.random() < rate * dt_ms / 1000:
+                self.add_vehicle(road, now_ms)
+        for road in self.roads:
+            lane = self.state[road]
+            queue = lane['queue']
+            if not queue or now_ms < lane['next_discharge']:
+                continue
+            # Emergency vehicles go through on red, like in the single intersection
+            if lane['light'] != 'green' and not queue[0][2]:
+                continue
+            car = queue.popleft()
+            self.queues[road] -= 1
+            lane['next_discharge'] = now_ms + self.headway_ms
+            self.stats['served'] += 1
+            self.stats['wait_ms'] += now_ms - car[1]
+            target = self.exits.get(road)
+            if target is None:
+                self.stats['exited'] += 1
+            else:
+                outbound.append((target[0], now_ms + target[1], road, car))
+
+    # --- TRAFFIC LIGHT LOGIC ---
+    def set_lights(self, roads, color):
+        for road in roads:
+            self.state[road]['light'] = color
+
+    def _start_cycle(self):
+        if self.manual_override:
+            self.phase = 'start'
+            self.phase_ends_at += OVERRIDE_RECHECK_MS
+            return
+
+        next_pair, duration = self.controller.next_phase(self)
+
+        # Emergency override
+        if self.is_emergency_active and self.emergency_target_road:
+            next_pair = next(n for n, roads in self.pairs.items() if self.emergency_target_road in roads)
+            duration *= 1.5
+            self.is_emergency_active = False
+
+        self.current_pair_name = next_pair
+        self.green_pair = self.pairs[next_pair]
+        self.green_started_at = self.time_ms
+        self.set_lights(self.green_pair, 'green')
+        self.stats['cycles'] += 1
+        self.phase = 'green'
+        self.phase_ends_at += int(duration)
+
+    def _advance_signals(self, now_ms):
+        if self.phase == 'green' and self.controller.on_tick(self):
+            self.phase_ends_at = min(self.phase_ends_at, now_ms)
+        while now_ms >= self.phase_ends_at:
+            if self.phase == 'start':
+                self._start_cycle()
+            elif self.phase == 'green':
+                self.set_lights(self.green_pair, 'yellow')
+                self.phase = 'yellow'
+                self.phase_ends_at += self.timing.yellow
+            elif self.phase == 'yellow':
+                self.set_lights(self.green_pair, 'red')
+                self.phase = 'all_red'
+                self.phase_ends_at += self.timing.all_red
+            else:
+                self.phase = 'start'
+
+    def _update_rates(self, dt_ms):
+        alpha = dt_ms / RATE_TAU_MS
+        per_s = 1000 / dt_ms
+        for road, count in self._arrivals.items():
+            self.rates[road] += alpha * (count * per_s - self.rates[road])
+            self._arrivals[road] = 0
+
+    def downstream_queue(self, road):
+        queues = self.downstream.get(road)
+        return queues.get(road, 0) if queues is not None else 0
+
+    def step(self, now_ms, dt_ms, outbound):
+        self.time_ms = now_ms
+        self._discharge(now_ms, dt_ms, outbound)
+        self._update_rates(dt_ms)
+        self._advance_signals(now_ms)
+
+    def queued(self):
+        return sum(self.queues.values())
+
+
+class Partition:
+    """The intersections of one partition, stepped together."""
+
+    def __init__(self, config, members, seed, dt_ms, window=None):
+        self.dt_ms = dt_ms
+        self.window = window
+        self.tick = 0
+        self.time_ms = 0
+        default_timing = config.get("timing") or {}
+        self.intersections = {}
+        for spec in config["intersections"]:
+            if spec["id"] not in members:
+                continue
+            timing = SignalTiming(**{**default_timing, **spec.get("timing", {})})
+            controller = make_controller(spec.get("controller", config.get("controller", "heuristic")))
+            self.intersections[spec["id"]] = Intersection(spec["id"], seed, timing=timing,
+                                                          pairs=spec.get("pairs"), controller=controller)
+        self.views = {}     # intersection id -> queue snapshot for the window
+        self.exported = []  # own intersections fed by links from other partitions
+        for link in config["links"]:
+            node = self.intersections.get(link["from"])
+            if node is not None:
+                road = OPPOSITE[link["heading"]]
+                node.exits[road] = (link["to"], link["travel_ms"])
+                node.downstream[road] = self.views.setdefault(link["to"], {})
+            elif link["to"] in self.intersections and link["to"] not in self.exported:
+                self.exported.append(link["to"])
+        for source in config.get("sources", []):
+            node = self.intersections.get(source["at"])
+            if node is not None:
+                node.arrival_rates[source["road"]] = source["rate"]
+        self.crossed_out = 0
+
+    def step(self, ticks, inbound=(), queues=None):
+        """Delivers cars and queue snapshots from other partitions, runs
+        ticks and returns the cars now heading to other partitions, plus the
+        queues they need for the next window if this one has ended."""
+        for target, due, road, car in inbound:
+            self.intersections[target].receive(due, road, car)
+        for iid, snapshot in (queues or {}).items():
+            self.views[iid].update(snapshot)
+        if self.window is None or self.tick % self.window == 0:
+            for iid, view in self.views.items():
+                node = self.intersections.get(iid)
+                if node is not None:
+                    view.update(node.queues)
+        outgoing = []
+        local = []
+        nodes = list(self.intersections.values())
+        for _ in range(ticks):
+            self.time_ms += self.dt_ms
+            for node in nodes:
+                node.step(self.time_ms, self.dt_ms, local)
+            for entry in local:
+                node = self.intersections.get(entry[0])
+                if node is None:
+                    outgoing.append(entry)
+                else:
+                    node.receive(*entry[1:])
+            local.clear()
+        self.tick += ticks
+        self.crossed_out += len(outgoing)
+        if self.window is not None and self.tick % self.window:
+            return outgoing, {}
+        return outgoing, {iid: dict(self.intersections[iid].queues) for iid in self.exported}
+
+    def stats(self):
+        totals = {'spawned': 0, 'served': 0, 'exited': 0, 'wait_ms': 0, 'cycles': 0, 'queued': 0}
+        for node in self.intersections.values():
+            for key, value in node.stats.items():
+                totals[key] += value
+            totals['queued'] += node.queued() + len(node.inbound)
+        totals['crossed'] = self.crossed_out
+        return totals
+
+
+def _worker(conn, config, members, seed, dt_ms, window):
+    part = Partition(config, members, seed, dt_ms, window)
+    while True:
+        message = conn.recv()
+        if message[0] == "step":
+            conn.send(part.step(*message[1:]))
+        elif message[0] == "stats":
+            conn.send(part.stats())
+        else:
+            conn.close()
+            return
+
+
+class Network:
+    """A partitioned road network; workers=1 runs everything in-process."""
+
+    def __init__(self, config, seed=0, dt_ms=UPDATE_RATE_MS, workers=1):
+        self.config = config
+        self.dt_ms = config.get("dt_ms", dt_ms)
+        self.tick = 0
+        self.owner = partition(config, workers)
+        self.parts = max(self.owner.values()) + 1
+        members = [set() for _ in range(self.parts)]
+        for iid, part in self.owner.items():
+            members[part].add(iid)
+
+        # Lookahead: the shortest link. Taken over all links, not just those
+        # crossing partitions, so the queue snapshots don't depend on the split
+        travel = [link["travel_ms"] for link in config["links"]]
+        self.window = max(1, min(travel) // self.dt_ms) if travel else None
+        # Remote intersections whose queues each partition reads
+        self._needs = [set() for _ in range(self.parts)]
+        for link in config["links"]:
+            if self.owner[link["from"]] != self.owner[link["to"]]:
+                self._needs[self.owner[link["from"]]].add(link["to"])
+
+        self._local = None
+        self._conns = []
+        self._procs = []
+        if self.parts == 1:
+            self._local = Partition(config, members[0], seed, self.dt_ms, self.window)
+            return
+        for part in range(self.parts):
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, args=(child, config, members[part], seed, self.dt_ms,
+                                                    self.window), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self._pending = [[] for _ in range(self.parts)]
+        self._queues = {}
+
+    def step(self, ticks=1):
+        while ticks > 0:
+            # Never step across a window boundary, so snapshots are taken at
+            # the same ticks however the caller splits its steps
+            window = ticks if self.window is None else min(ticks, self.window - self.tick % self.window)
+            if self._local is not None:
+                self._local.step(window)
+            else:
+                for part, (conn, inbound) in enumerate(zip(self._conns, self._pending)):
+                    queues = {iid: self._queues[iid] for iid in self._needs[part] if iid in self._queues}
+                    conn.send(("step", window, inbound, queues))
+                self._pending = [[] for _ in range(self.parts)]
+                self._queues = {}
+                for conn in self._conns:
+                    outgoing, queues = conn.recv()
+                    for entry in outgoing:
+                        self._pending[self.owner[entry[0]]].append(entry)
+                    self._queues.update(queues)
+            ticks -= window
+            self.tick += window
+
+    def stats(self):
+        if self._local is not None:
+            parts = [self._local.stats()]
+        else:
+            for conn in self._conns:
+                conn.send(("stats",))
+            parts = [conn.recv() for conn in self._conns]
+        totals = {}
+        for part in parts:
+            for key, value in part.items():
+                totals[key] = totals.get(key, 0) + value
+        # Cars still in flight between partitions
+        totals['queued'] += sum(len(p) for p in getattr(self, "_pending", ()))
+        totals['avg_wait_s'] = round(totals['wait_ms'] / totals['served'] / 1000, 2) if totals['served'] else None
+        return totals
+
+    def close(self):
+        for conn in self._conns:
+            conn.send(("stop",))
+        for proc in self._procs:
+            proc.join()
+        self._conns, self._procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_partitioning(config, ticks, seed=0, workers=4, controllers=("heuristic", "max_pressure")):
+    """Runs config in one process and split across workers with each
+    controller; returns {controller: (one-process stats, partitioned stats)}
+    for those whose totals differ."""
+    mismatches = {}
+    for name in controllers:
+        runs = []
+        for n in (1, workers):
+            with Network({**config, "controller": name}, seed=seed, workers=n) as net:
+                net.step(ticks)
+                stats = net.stats()
+            stats.pop('crossed')  # cars crossing partitions; 0 in one process
+            runs.append(stats)
+        if runs[0] != runs[1]:
+            mismatches[name] = tuple(runs)
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a network of signalized intersections")
+    parser.add_argument("config", nargs="?", help="network config JSON")
+    parser.add_argument("--grid", help="ROWSxCOLS grid instead of a config file")
+    parser.add_argument("--arrival-rate", type=float, default=0.1,
+                        help="vehicles per simulated second on each edge approach (--grid)")
+    parser.add_argument("--ticks", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--controller", help="signal controller for every intersection")
+    parser.add_argument("--check", action="store_true",
+                        help="check that heuristic and max_pressure give the same totals in one "
+                             "process and across --workers partitions")
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        rows, cols = (int(n) for n in args.grid.lower().split("x"))
+        config = grid_config(rows, cols, arrival_rate=args.arrival_rate)
+    elif args.config:
+        config = load_config(args.config)
+    else:
+        parser.error("give a config file or --grid")
+    if args.check:
+        mismatches = check_partitioning(config, args.ticks, args.seed, max(2, args.workers))
+        for name, (single, split) in mismatches.items():
+            print(f"{name}: 1 worker {single} != {max(2, args.workers)} workers {split}")
+        if mismatches:
+            raise SystemExit(1)
+        print(f"partitioning check passed ({args.ticks} ticks)")
+        return
+    if args.controller:
+        config["controller"] = args.controller
+
+    with Network(config, seed=args.seed, workers=args.workers) as net:
+        started = time.perf_counter()
+        net.step(args.ticks)
+        elapsed = time.perf_counter() - started
+        print(f"{len(config['intersections'])} intersections, {net.parts} partitions, "
+              f"{args.ticks} ticks in {elapsed:.2f}s ({args.ticks / elapsed:,.0f} ticks/s)")
+        print(f"stats: {net.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import random
+import time
+
+from traffic_controllers import HeuristicController, make_controller
+from vehicle_store import Lane
+
+# --- CONFIGURATION CONSTANTS ---
+CANVAS_SIZE = 600
+ROAD_WIDTH = 60
+INTERSECTION_SIZE = 100
+
+# Traffic Light Timing (ms)
+BASE_GREEN_TIME = 10000  # 10 seconds for demo
+VEHICLE_BONUS_TIME = 2000
+YELLOW_TIME = 3000
+ALL_RED_TIME = 1000
+UPDATE_RATE_MS = 30
+
+# Car Movement
+CAR_SPEED = 3
+
+# Road mapping
+ROAD_PAIRS_MAP = {
+    'NS': ['north', 'south'],
+    'EW': ['east', 'west']
+}
+ROADS = ['north', 'east', 'south', 'west']
+
+FIRST_CYCLE_MS = 100      # delay before the first green, as in the Tk app
+OVERRIDE_RECHECK_MS = 1000
+RATE_TAU_MS = 30000       # time constant of the arrival-rate EWMA
+
+
+def make_lane(road):
+    """Lane geometry for one approach, matching the Tk canvas layout."""
+    half = CANVAS_SIZE/2
+    lane_offset = ROAD_WIDTH/2 - 15
+    length, breadth = 25, 15
+    near, far = half - INTERSECTION_SIZE/2, half + INTERSECTION_SIZE/2
+    if road == 'north':
+        return Lane('y', +1, half + lane_offset - breadth/2, length, breadth, -length, CANVAS_SIZE, near)
+    if road == 'south':
+        return Lane('y', -1, half - lane_offset - breadth/2, length, breadth, CANVAS_SIZE, 0, far)
+    if road == 'east':
+        return Lane('x', -1, half + lane_offset - breadth/2, length, breadth, CANVAS_SIZE, 0, far)
+    if road == 'west':
+        return Lane('x', +1, half - lane_offset - breadth/2, length, breadth, -length, CANVAS_SIZE, near)
+    raise ValueError(f"Unknown road: {road}")
+
+
+class SignalTiming:
+    """Signal timing parameters (ms); defaults are the module constants."""
+
+    def __init__(self, base_green=BASE_GREEN_TIME, vehicle_bonus=VEHICLE_BONUS_TIME,
+                 yellow=YELLOW_TIME, all_red=ALL_RED_TIME):
+        self.base_green = base_green
+        self.vehicle_bonus = vehicle_bonus
+        self.yellow = yellow
+        self.all_red = all_red
+
+
+class TrafficSimulation:
+    """Headless, deterministic simulation of the four-way intersection.
+
+    Time advances only through step(), in fixed ticks of dt_ms simulated
+    milliseconds, so a run can go as fast as the CPU allows and the same seed
+    always gives the same run. The Tk app is one renderer on top of this.
+
+    Observers (e.g. the trace recorder) get on_input(sim, kind, args) for
+    every outside input and on_tick(sim) after every tick.
+    """
+
+    def __init__(self, seed=None, timing=None, dt_ms=UPDATE_RATE_MS, arrival_rates=None,
+                 controller=None):
+        if seed is None:
+            # Still pick a concrete seed so the run can be recorded and replayed
+            seed = random.SystemRandom().randrange(2**63)
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.timing = timing or SignalTiming()
+        self.dt_ms = dt_ms
+        # Vehicles per simulated second spawning on each road (0 = manual only)
+        self.arrival_rates = {r: 0.0 for r in ROADS}
+        self.arrival_rates.update(arrival_rates or {})
+
+        # --- State Variables ---
+        self.roads = list(ROADS)
+        self.state = {r: {'light': 'red'} for r in self.roads}
+        self.lanes = {r: make_lane(r) for r in self.roads}
+        self.pairs = ROAD_PAIRS_MAP
+        self.controller = controller or HeuristicController()
+        # Controller inputs, kept up to date every tick in O(roads)
+        self.queues = {r: 0 for r in self.roads}
+        self.rates = {r: 0.0 for r in self.roads}
+        self._arrivals = {r: 0 for r in self.roads}
+        self.green_started_at = None
+        self.current_pair_name = 'NS'
+        self.manual_override = False
+        self.is_emergency_active = False
+        self.emergency_target_road = None
+        self.status = "Initializing..."
+
+        self.time_ms = 0
+        self.tick = 0
+        self._next_vid = 0
+        # Signal phase machine replacing the Tk after() chain:
+        # 'start' -> 'green' -> 'yellow' -> 'all_red' -> 'green' ...
+        self.phase = 'start'
+        self.phase_ends_at = FIRST_CYCLE_MS
+        self.green_pair = None
+
+        self.stats = {'spawned': 0, 'departed': 0, 'cycles': 0}
+        # Run metrics for sweeps: car-ticks spent stopped, time some pair was
+        # green, and emergency vehicles still on their way {vid: (road, t0)}
+        self.metrics = {'stopped_ticks': 0, 'green_ms': 0, 'clearance_ms': []}
+        self._emergencies = {}
+        self.observers = []
+
+    def _notify_input(self, kind, *args):
+        for observer in self.observers:
+            observer.on_input(self, kind, args)
+
+    # --- VEHICLE LOGIC ---
+    def add_vehicle(self, road, is_emergency=False):
+        """Outside input (a button press); arrivals use _spawn()."""
+        self._notify_input('add', road, is_emergency)
+        return self._spawn(road, is_emergency)
+
+    def _spawn(self, road, is_emergency=False):
+        vid = self._next_vid
+        self._next_vid += 1
+        self.stats['spawned'] += 1
+        lane = self.lanes[road]
+        lane.spawn(vid, self.rng.randint(0, 0xFFFFFF), is_emergency)
+        self.queues[road] = lane.queued
+        self._arrivals[road] += 1
+        if is_emergency:
+            self._emergencies[vid] = (road, self.time_ms)
+        return vid
+
+    def populate_demo(self):
+        """The Tk demo's starting traffic: one to three cars per road."""
+        self._notify_input('demo')
+        for road in self.roads:
+            for _ in range(self.rng.randint(1, 3)):
+                self._spawn(road)
+
+    def _spawn_arrivals(self):
+        for road, rate in self.arrival_rates.items():
+            if rate and self.rng.random() < rate * self.dt_ms / 1000:
+                self._spawn(road)
+
+    def _move_vehicles(self):
+        departed = stopped = 0
+        for road, lane in self.lanes.items():
+            departed += lane.step(self.state[road]['light'] == 'green', CAR_SPEED)
+            self.queues[road] = lane.queued
+            stopped += lane.stopped
+        self.stats['departed'] += departed
+        self.metrics['stopped_ticks'] += stopped
+        if self.phase == 'green':
+            self.metrics['green_ms'] += self.dt_ms
+        if not self._emergencies:
+            return
+        for vid, (road, since) in list(self._emergencies.items()):
+            if not self.lanes[road].contains(vid):
+                del self._emergencies[vid]
+                self.metrics['clearance_ms'].append(self.time_ms - since)
+
+    # --- TRAFFIC LIGHT LOGIC ---
+    def set_lights(self, road1, road2, color):
+        self.state[road1]['light'] = color
+        self.state[road2]['light'] = color
+
+    def _start_cycle(self):
+        if self.manual_override:
+            self.status = f"Manual Override ({self.current_pair_name})"
+            self.phase = 'start'
+            self.phase_ends_at += OVERRIDE_RECHECK_MS
+            return
+
+        next_pair, duration = self.controller.next_phase(self)
+
+        # Emergency override
+        if self.is_emergency_active and self.emergency_target_road:
+            next_pair = 'NS' if self.emergency_target_road in ['north','south'] else 'EW'
+            duration *= 1.5
+            self.is_emergency_active = False
+
+        road1, road2 = ROAD_PAIRS_MAP[next_pair]
+        self.current_pair_name = next_pair
+        self.green_pair = (road1, road2)
+        self.green_started_at = self.time_ms
+        self.set_lights(road1, road2, 'green')
+        self.status = f"{road1.upper()}/{road2.upper()} GREEN for {duration//1000}s"
+        self.stats['cycles'] += 1
+        self.phase = 'green'
+        self.phase_ends_at += int(duration)
+
+    def _advance_signals(self):
+        if self.phase == 'green' and self.controller.on_tick(self):
+            self.phase_ends_at = min(self.phase_ends_at, self.time_ms)
+        # Several transitions can fall inside one long tick
+        while self.time_ms >= self.phase_ends_at:
+            if self.phase == 'start':
+                self._start_cycle()
+            elif self.phase == 'green':
+                self.set_lights(*self.green_pair, 'yellow')
+                self.phase = 'yellow'
+                self.phase_ends_at += self.timing.yellow
+            elif self.phase == 'yellow':
+                self.set_lights(*self.green_pair, 'red')
+                self.phase = 'all_red'
+                self.phase_ends_at += self.timing.all_red
+            else:
+                self.phase = 'start'
+
+    # --- EMERGENCY OVERRIDE ---
+    def toggle_emergency(self):
+        self._notify_input('emergency')
+        self.is_emergency_active = True
+        # Pick the road with most stopped cars
+        counts = {r: len(self.lanes[r]) for r in self.roads}
+        self.emergency_target_road = max(counts, key=counts.get)
+        # Mark first car as emergency
+        lane = self.lanes[self.emergency_target_road]
+        head = lane.front()
+        if head is not None:
+            lane.mark_emergency(head)
+            self._emergencies.setdefault(int(lane.vid[head]), (self.emergency_target_road, self.time_ms))
+
+    # --- CLOCK ---
+    def step(self, ticks=1):
+        for _ in range(ticks):
+            self.tick += 1
+            self.time_ms += self.dt_ms
+            self._spawn_arrivals()
+            self._move_vehicles()
+            self._update_rates()
+            self._advance_signals()
+            for observer in self.observers:
+                observer.on_tick(self)
+
+    def _update_rates(self):
+        alpha = self.dt_ms / RATE_TAU_MS
+        per_s = 1000 / self.dt_ms
+        rates, arrivals = self.rates, self._arrivals
+        for road, count in arrivals.items():
+            rates[road] += alpha * (count * per_s - rates[road])
+            if count:
+                arrivals[road] = 0
+
+    def downstream_queue(self, road):
+        return 0  # cars leave the canvas after the intersection
+
+    def vehicle_count(self):
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def summary(self):
+        """Per-run figures used by the sweep runner."""
+        m = self.metrics
+        departed = self.stats['departed']
+        clearance = m['clearance_ms']
+        return {
+            'avg_wait_s': m['stopped_ticks'] * self.dt_ms / 1000 / departed if departed else None,
+            'avg_queue': m['stopped_ticks'] / self.tick if self.tick else 0.0,
+            'throughput_per_green_s': departed / (m['green_ms'] / 1000) if m['green_ms'] else None,
+            'emergency_clearance_s': sum(clearance) / len(clearance) / 1000 if clearance else None,
+            'departed': departed,
+            'spawned': self.stats['spawned'],
+            'cycles': self.stats['cycles'],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the traffic simulation headless")
+    parser.add_argument("--ticks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arrival-rate", type=float, default=0.2,
+                        help="vehicles per simulated second on each road")
+    parser.add_argument("--controller", default="heuristic")
+    args = parser.parse_args(argv)
+
+    sim = TrafficSimulation(seed=args.seed, arrival_rates={r: args.arrival_rate for r in ROADS},
+                            controller=make_controller(args.controller))
+    sim.populate_demo()
+    started = time.perf_counter()
+    sim.step(args.ticks)
+    elapsed = time.perf_counter() - started
+    simulated_s = sim.time_ms / 1000
+    print(f"{args.ticks} ticks ({simulated_s / 3600:.1f} simulated hours) in {elapsed:.2f}s "
+          f"-> {args.ticks / elapsed * 60:,.0f} ticks/min, {simulated_s / elapsed:,.0f}x real time")
+    print(f"stats: {sim.stats}")
+
+
+if __name__ == "__main__":
+    main()
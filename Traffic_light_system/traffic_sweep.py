@@ -0,0 +1,280 @@
+"""Parameter sweeps and Monte Carlo runs of the signal timing.
+
+Runs the headless simulation for every combination of timing values (or N
+random samples) x arrival-rate scenario x replication on a process pool and
+streams one row per run to a CSV or Parquet table:
+
+    python traffic_sweep.py --set base_green=6000,10000,14000 \\
+        --set vehicle_bonus=1000,2000 --scenario light=0.05 --scenario heavy=0.3 \\
+        --reps 5 --ticks 200000 --output sweep.csv
+
+    python traffic_sweep.py --sample 200 --range base_green=4000:20000 \\
+        --range yellow=2000:5000 --scenario rush=north:0.4,south:0.4,east:0.1,west:0.1 \\
+        --output sweep.parquet
+
+Finished runs are cached by a hash of their full configuration, so running
+a sweep again (or a larger one that overlaps it) only simulates new cells.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from traffic_controllers import CONTROLLERS, make_controller
+from traffic_sim import ROADS, UPDATE_RATE_MS, SignalTiming, TrafficSimulation
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+TIMING_FIELDS = ["base_green", "vehicle_bonus", "yellow", "all_red"]
+METRICS = ["avg_wait_s", "avg_queue", "throughput_per_green_s", "emergency_clearance_s",
+           "departed", "spawned", "cycles"]
+COLUMNS = ["key", "scenario", "controller", "rep", "seed"] + TIMING_FIELDS + METRICS
+# Parquet column types; floats may be None (e.g. no emergencies in a run)
+STRING_COLUMNS = {"key", "scenario", "controller"}
+FLOAT_COLUMNS = {"avg_wait_s", "avg_queue", "throughput_per_green_s", "emergency_clearance_s"}
+# Bump when the simulation changes in a way that invalidates cached results
+CACHE_VERSION = 3
+
+
+def parse_scenario(spec):
+    """"name=0.2" (same rate on every road) or "name=north:0.4,east:0.1"."""
+    name, _, rates = spec.partition("=")
+    if ":" not in rates:
+        return name, {r: float(rates) for r in ROADS}
+    parsed = {r: 0.0 for r in ROADS}
+    for part in rates.split(","):
+        road, _, rate = part.partition(":")
+        if road not in parsed:
+            raise ValueError(f"Unknown road: {road}")
+        parsed[road] = float(rate)
+    return name, parsed
+
+
+def timing_grid(values):
+    """Cartesian product of {field: [values]}; unset fields keep the defaults."""
+    defaults = vars(SignalTiming())
+    fields = list(values)
+    for combo in itertools.product(*(values[f] for f in fields)):
+        yield {**defaults, **dict(zip(fields, combo))}
+
+
+def timing_samples(ranges, n, rng):
+    """n random timings, each field uniform over its (low, high) range."""
+    defaults = vars(SignalTiming())
+    for _ in range(n):
+        yield {**defaults, **{f: rng.randint(low, high) for f, (low, high) in ranges.items()}}
+
+
+def cell_key(cell):
+    blob = json.dumps({**cell, "version": CACHE_VERSION}, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def run_cell(cell):
+    """One simulation run; top level so worker processes can unpickle it."""
+    sim = TrafficSimulation(seed=cell["seed"], timing=SignalTiming(**cell["timing"]),
+                            arrival_rates=cell["rates"], controller=make_controller(cell["controller"]))
+    every = cell["emergency_every_ticks"]
+    done = 0
+    while done < cell["ticks"]:
+        chunk = min(every or cell["ticks"], cell["ticks"] - done)
+        sim.step(chunk)
+        done += chunk
+        if every and done < cell["ticks"]:
+            sim.toggle_emergency()
+    return sim.summary()
+
+
+class ResultCache:
+    """One small JSON file per finished cell, named by its configuration hash."""
+
+    def __init__(self, root):
+        self.root = root
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def get(self, key):
+        if not self.root:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        if not self.root:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+
+
+class CsvSink:
+    def __init__(self, path):
+        self.file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetSink:
+    """Streams rows into row groups of batch_size."""
+
+    def __init__(self, path, batch_size=256):
+        if pq is None:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = []
+        # Fixed up front: inferring it from the first batch would type an
+        # all-None column as null and reject later batches with values
+        self.schema = pa.schema([
+            (c, pa.string() if c in STRING_COLUMNS else pa.float64() if c in FLOAT_COLUMNS else pa.int64())
+            for c in COLUMNS])
+        self.writer = None
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        table = pa.Table.from_pylist(self.rows, schema=self.schema)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_sink(path):
+    if path.endswith(".parquet"):
+        return ParquetSink(path)
+    return CsvSink(path)
+
+
+def build_cells(timings, scenarios, controllers, reps, ticks, base_seed, emergency_every_ticks):
+    for timing, (name, rates), controller in itertools.product(timings, scenarios, controllers):
+        for rep in range(reps):
+            cell = {"timing": timing, "rates": rates, "controller": controller, "ticks": ticks,
+                    "emergency_every_ticks": emergency_every_ticks, "rep": rep}
+            # Per-run seed from the run's own configuration (not its position
+            # in the sweep), so adding cells never changes existing results
+            seed_source = json.dumps({**cell, "base_seed": base_seed}, sort_keys=True)
+            cell["seed"] = int(hashlib.sha1(seed_source.encode("utf-8")).hexdigest()[:8], 16)
+            yield name, cell
+
+
+def sweep(cells, sink, cache, workers):
+    """Runs cells (name, cell) on a process pool, writing rows as runs finish.
+    Returns (simulated, cached) counts."""
+    def row(name, cell, key, result):
+        return {"key": key, "scenario": name, "controller": cell["controller"],
+                "rep": cell["rep"], "seed": cell["seed"],
+                **cell["timing"], **{m: result.get(m) for m in METRICS}}
+
+    simulated = cached = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for name, cell in cells:
+            key = cell_key(cell)
+            result = cache.get(key)
+            if result is not None:
+                sink.write(row(name, cell, key, result))
+                cached += 1
+            else:
+                futures[pool.submit(run_cell, cell)] = (name, cell, key)
+        for future in as_completed(futures):
+            name, cell, key = futures.pop(future)
+            result = future.result()
+            cache.put(key, result)
+            sink.write(row(name, cell, key, result))
+            simulated += 1
+    return simulated, cached
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=V1,V2,...",
+                        help=f"grid values for one of {', '.join(TIMING_FIELDS)} (ms)")
+    parser.add_argument("--sample", type=int, help="draw N random timings from the --range bounds")
+    parser.add_argument("--range", action="append", default=[], metavar="FIELD=LOW:HIGH")
+    parser.add_argument("--scenario", action="append", default=[], metavar="NAME=RATES",
+                        help="arrival rates in vehicles/s: NAME=0.2 or NAME=north:0.4,east:0.1")
+    parser.add_argument("--controller", action="append", choices=list(CONTROLLERS),
+                        help="signal controller(s) to compare (default: heuristic)")
+    parser.add_argument("--reps", type=int, default=3, help="replications per cell")
+    parser.add_argument("--ticks", type=int, default=100_000, help="ticks per run")
+    parser.add_argument("--emergency-every", type=float, default=120.0,
+                        help="simulated seconds between emergency presses (0 = none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-dir", default=".sweep_cache", help="'' disables the cache")
+    parser.add_argument("--output", default="-", help="CSV or .parquet file, - for stdout")
+    args = parser.parse_args(argv)
+
+    def split(spec):
+        field, _, values = spec.partition("=")
+        if field not in TIMING_FIELDS:
+            parser.error(f"unknown timing field: {field}")
+        return field, values
+
+    if args.sample:
+        if not args.range:
+            parser.error("--sample needs at least one --range to sample from")
+        ranges = {}
+        for spec in args.range:
+            field, bounds = split(spec)
+            low, _, high = bounds.partition(":")
+            ranges[field] = (int(low), int(high))
+        timings = list(timing_samples(ranges, args.sample, random.Random(args.seed)))
+    else:
+        grid = {}
+        for spec in args.set:
+            field, values = split(spec)
+            grid[field] = [int(v) for v in values.split(",")]
+        timings = list(timing_grid(grid))
+    scenarios = [parse_scenario(s) for s in args.scenario] or [parse_scenario("default=0.2")]
+
+    every = int(args.emergency_every * 1000 // UPDATE_RATE_MS)
+    cells = build_cells(timings, scenarios, args.controller or ["heuristic"], args.reps,
+                        args.ticks, args.seed, every)
+    sink = open_sink(args.output)
+    try:
+        simulated, cached = sweep(cells, sink, ResultCache(args.cache_dir), args.workers)
+    finally:
+        sink.close()
+    print(f"[sweep] {simulated} runs simulated, {cached} from cache", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
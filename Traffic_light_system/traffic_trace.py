@@ -0,0 +1,371 @@
+"""Binary trace recording and replay for TrafficSimulation.
+
+A trace file is laid out as
+
+    header | frame 0 | frame 1 | ... | frame N | index | events
+
+Every tick is one frame. Each frame starts with the tick, the four lights
+and one fixed-width count header per road, followed by fixed-width vehicle
+records. Every keyframe_every ticks the frame is a keyframe holding every
+car's absolute position. The frames in between only hold, per road, how
+many cars left the front of the lane, the cars that joined at the back, and
+a 3-byte (position delta, flags) record for each remaining car. That works
+because lanes keep their cars in driving order.
+
+The index holds one u64 file offset per frame, so any tick is found in
+O(1). Decoding a tick replays at most keyframe_every - 1 deltas after its
+keyframe. Positions are stored in 1/64 px fixed point, so deltas never
+drift. The file is read through mmap and numpy.frombuffer without copying.
+
+The recorded inputs are the seed, timing, arrival rates, controller and
+every outside input (the demo population, add-vehicle and emergency
+button presses, with the tick they happened at). Re-running them reproduces
+the same run exactly.
+
+    python traffic_trace.py record run.trace --ticks 100000 --arrival-rate 0.2
+    python traffic_trace.py info run.trace
+    python traffic_trace.py show run.trace --start 5000 --stop 5010
+    python traffic_trace.py verify run.trace
+"""
+import argparse
+import mmap
+import struct
+from array import array
+
+import numpy as np
+
+from traffic_controllers import CONTROLLERS, make_controller
+from traffic_sim import ROADS, SignalTiming, TrafficSimulation
+
+MAGIC = b"TLTRACE1"
+VERSION = 1
+SCALE = 64  # fixed-point positions: 1/64 px
+
+# magic, version, dt_ms, keyframe_every, seed, frames, index_offset,
+# events_offset, event count, timing (base_green, vehicle_bonus, yellow,
+# all_red), arrival rates per road (ROADS order), controller name
+HEADER = struct.Struct("<8sHIIqQQQI4q4d16s")
+FRAME = struct.Struct("<IBB")            # tick, is_keyframe, lights (2 bits per road)
+ROAD_KEY = struct.Struct("<I")           # cars in the lane
+ROAD_DELTA = struct.Struct("<II")        # cars gone from the front, cars added at the back
+EVENT = struct.Struct("<QBBB")           # tick, kind, road, is_emergency
+
+CAR = np.dtype([("vid", "<i8"), ("pos", "<i4"), ("color", "<u4"), ("flags", "u1")])
+DELTA = np.dtype([("dpos", "<i2"), ("flags", "u1")])
+
+LIGHTS = ['red', 'yellow', 'green']
+EVENT_KINDS = ['demo', 'add', 'emergency']
+
+
+def _controller_name(controller):
+    for name, cls in CONTROLLERS.items():
+        if type(controller) is cls:
+            return name
+    raise ValueError(f"Can't record custom controller {type(controller).__name__}")
+
+
+class TraceRecorder:
+    """Sim observer writing one frame per tick; call close() to finish."""
+
+    def __init__(self, path, sim, keyframe_every=100):
+        if sim.tick:
+            raise ValueError("Attach the recorder before the simulation's first step")
+        self.sim = sim
+        self.keyframe_every = keyframe_every
+        self.controller = _controller_name(sim.controller)
+        self.file = open(path, "wb")
+        self.file.write(b"\0" * HEADER.size)  # rewritten by close()
+        self.offset = HEADER.size
+        self.index = array("Q")
+        self.events = []
+        self._prev = None
+        self._write_frame()
+        sim.observers.append(self)
+
+    # --- Observer hooks ---
+    def on_input(self, sim, kind, args):
+        road = ROADS.index(args[0]) if kind == 'add' else 0
+        emergency = bool(args[1]) if kind == 'add' else False
+        self.events.append((sim.tick, EVENT_KINDS.index(kind), road, emergency))
+
+    def on_tick(self, sim):
+        self._write_frame()
+
+    # --- Encoding ---
+    def _lane_state(self):
+        state = []
+        for road in ROADS:
+            lane = self.sim.lanes[road]
+            live = lane.live
+            state.append((lane.vid[live].copy(),
+                          np.rint(lane.pos[live] * SCALE).astype(np.int32),
+                          lane.color[live].copy(),
+                          lane.flags[live].copy()))
+        return state
+
+    def _write_frame(self):
+        sim = self.sim
+        tick = len(self.index)
+        lights = 0
+        for i, road in enumerate(ROADS):
+            lights |= LIGHTS.index(sim.state[road]['light']) << (2 * i)
+        state = self._lane_state()
+
+        parts = None
+        if self._prev is not None and tick % self.keyframe_every:
+            parts = self._delta_parts(state)
+        if parts is None:
+            heads = [ROAD_KEY.pack(len(vid)) for vid, _, _, _ in state]
+            parts = [FRAME.pack(tick, 1, lights)] + heads + [self._cars(*s) for s in state]
+        else:
+            parts[0] = FRAME.pack(tick, 0, lights)
+
+        self.index.append(self.offset)
+        for part in parts:
+            self.file.write(part)
+            self.offset += len(part)
+        self._prev = state
+
+    def _cars(self, vid, pos, color, flags):
+        out = np.empty(len(vid), dtype=CAR)
+        out["vid"], out["pos"], out["color"], out["flags"] = vid, pos, color, flags
+        return out.tobytes()
+
+    def _delta_parts(self, state):
+        heads, bodies = [], []
+        for (vid, pos, color, flags), (pvid, ppos, _, _) in zip(state, self._prev):
+            # Cars leave only from the front and join only at the back, and
+            # ids grow in spawn order, so the survivors are a suffix of prev.
+            gone = int(np.searchsorted(pvid, vid[0])) if len(vid) else len(pvid)
+            kept = len(pvid) - gone
+            if kept > len(vid) or (kept and not np.array_equal(pvid[gone:], vid[:kept])):
+                return None
+            dpos = pos[:kept] - ppos[gone:]
+            if kept and np.abs(dpos).max() > 32767:
+                return None  # too far for an i16 delta; write a keyframe
+            delta = np.empty(kept, dtype=DELTA)
+            delta["dpos"], delta["flags"] = dpos, flags[:kept]
+            heads.append(ROAD_DELTA.pack(gone, len(vid) - kept))
+            bodies.append(self._cars(vid[kept:], pos[kept:], color[kept:], flags[kept:]))
+            bodies.append(delta.tobytes())
+        return [None] + heads + bodies
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self in self.sim.observers:
+            self.sim.observers.remove(self)
+        index_offset = self.offset
+        self.file.write(self.index.tobytes())
+        events_offset = index_offset + len(self.index) * 8
+        for event in self.events:
+            self.file.write(EVENT.pack(*event))
+        sim = self.sim
+        t = sim.timing
+        self.file.seek(0)
+        self.file.write(HEADER.pack(
+            MAGIC, VERSION, sim.dt_ms, self.keyframe_every, sim.seed, len(self.index),
+            index_offset, events_offset, len(self.events),
+            t.base_green, t.vehicle_bonus, t.yellow, t.all_red,
+            *(float(sim.arrival_rates[r]) for r in ROADS), self.controller.encode("ascii")))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Frame:
+    """Decoded state at one tick: lights and per-road car arrays (front first)."""
+
+    def __init__(self, tick, lights, cars):
+        self.tick = tick
+        self.lights = lights  # {road: 'red' | 'yellow' | 'green'}
+        self.cars = cars      # {road: (vid, pos, color, flags)} NumPy arrays, pos in px
+
+    def positions(self, road):
+        return self.cars[road][1]
+
+
+class TraceReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.dt_ms, self.keyframe_every, self.seed, self.frames,
+         index_offset, events_offset, n_events, *rest) = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} traffic trace")
+        self.timing = SignalTiming(*rest[:4])
+        self.arrival_rates = dict(zip(ROADS, rest[4:8]))
+        self.controller = rest[8].rstrip(b"\0").decode("ascii")
+        self.index = np.frombuffer(self.buf, dtype="<u8", count=self.frames, offset=index_offset)
+        self.events = [EVENT.unpack_from(self.buf, events_offset + i * EVENT.size)
+                       for i in range(n_events)]
+
+    def close(self):
+        self.index = None
+        self.buf.close()
+        self.file.close()
+
+    # --- Decoding ---
+    def _decode(self, tick, prev):
+        offset = int(self.index[tick])
+        _, keyframe, lights = FRAME.unpack_from(self.buf, offset)
+        offset += FRAME.size
+        light_map = {r: LIGHTS[(lights >> (2 * i)) & 3] for i, r in enumerate(ROADS)}
+        state = []
+        if keyframe:
+            counts = [ROAD_KEY.unpack_from(self.buf, offset + i * ROAD_KEY.size)[0]
+                      for i in range(len(ROADS))]
+            offset += ROAD_KEY.size * len(ROADS)
+            for n in counts:
+                cars = np.frombuffer(self.buf, dtype=CAR, count=n, offset=offset)
+                offset += n * CAR.itemsize
+                state.append((cars["vid"], cars["pos"], cars["color"], cars["flags"]))
+            return light_map, state
+        heads = [ROAD_DELTA.unpack_from(self.buf, offset + i * ROAD_DELTA.size)
+                 for i in range(len(ROADS))]
+        offset += ROAD_DELTA.size * len(ROADS)
+        for (gone, added), (pvid, ppos, pcolor, _) in zip(heads, prev):
+            kept = len(pvid) - gone
+            new = np.frombuffer(self.buf, dtype=CAR, count=added, offset=offset)
+            offset += added * CAR.itemsize
+            delta = np.frombuffer(self.buf, dtype=DELTA, count=kept, offset=offset)
+            offset += kept * DELTA.itemsize
+            state.append((np.concatenate([pvid[gone:], new["vid"]]),
+                          np.concatenate([ppos[gone:] + delta["dpos"], new["pos"]]),
+                          np.concatenate([pcolor[gone:], new["color"]]),
+                          np.concatenate([delta["flags"], new["flags"]])))
+        return light_map, state
+
+    def window(self, start, stop=None):
+        """Yields Frames for ticks [start, stop), decoding from the keyframe
+        at or before start rather than from the beginning."""
+        stop = self.frames if stop is None else min(stop, self.frames)
+        if not 0 <= start < self.frames:
+            raise IndexError(f"tick {start} not in trace (0..{self.frames - 1})")
+        state = None
+        for tick in range(start - start % self.keyframe_every, stop):
+            lights, state = self._decode(tick, state)
+            if tick >= start:
+                yield Frame(tick, lights, {road: (vid, pos / SCALE, color, flags)
+                                           for road, (vid, pos, color, flags) in zip(ROADS, state)})
+
+    def frame(self, tick):
+        return next(self.window(tick, tick + 1))
+
+    # --- Replay ---
+    def rerun_sim(self):
+        """A fresh simulation that re-applies the recorded inputs as it steps,
+        reproducing the recorded run tick for tick."""
+        sim = TrafficSimulation(seed=self.seed, timing=self.timing, dt_ms=self.dt_ms,
+                                arrival_rates=self.arrival_rates,
+                                controller=make_controller(self.controller))
+        player = EventPlayer(self.events)
+        player.apply(sim)
+        sim.observers.append(player)
+        return sim
+
+    def verify(self, ticks=None):
+        """Re-runs the trace and returns the first tick whose cars or lights
+        differ from the recording, or None if the replay matched."""
+        ticks = self.frames if ticks is None else min(ticks, self.frames)
+        sim = TrafficSimulation(seed=self.seed, timing=self.timing, dt_ms=self.dt_ms,
+                                arrival_rates=self.arrival_rates,
+                                controller=make_controller(self.controller))
+        player = EventPlayer(self.events)
+        for frame in self.window(0, ticks):
+            if frame.tick:
+                sim.step()
+            for road in ROADS:
+                lane = sim.lanes[road]
+                vid, pos, _, flags = frame.cars[road]
+                if (sim.state[road]['light'] != frame.lights[road]
+                        or not np.array_equal(lane.vid[lane.live], vid)
+                        or not np.array_equal(np.rint(lane.pos[lane.live] * SCALE), pos * SCALE)
+                        or not np.array_equal(lane.flags[lane.live], flags)):
+                    return frame.tick
+            # Inputs at a tick were recorded after that tick's frame
+            player.apply(sim)
+        return None
+
+
+class EventPlayer:
+    """Sim observer feeding recorded inputs back in at their ticks."""
+
+    def __init__(self, events):
+        self.events = sorted(events)
+        self.next = 0
+
+    def apply(self, sim):
+        while self.next < len(self.events) and self.events[self.next][0] <= sim.tick:
+            _, kind, road, emergency = self.events[self.next]
+            self.next += 1
+            kind = EVENT_KINDS[kind]
+            if kind == 'demo':
+                sim.populate_demo()
+            elif kind == 'add':
+                sim.add_vehicle(ROADS[road], bool(emergency))
+            else:
+                sim.toggle_emergency()
+
+    def on_input(self, sim, kind, args):
+        pass
+
+    def on_tick(self, sim):
+        self.apply(sim)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="record a headless run")
+    rec.add_argument("trace")
+    rec.add_argument("--ticks", type=int, default=100_000)
+    rec.add_argument("--seed", type=int)
+    rec.add_argument("--arrival-rate", type=float, default=0.2)
+    rec.add_argument("--controller", default="heuristic", choices=list(CONTROLLERS))
+    rec.add_argument("--emergency-every", type=int, default=0, help="press emergency every N ticks")
+    rec.add_argument("--keyframe-every", type=int, default=100)
+    for name in ("info", "show", "verify"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("trace")
+        if name == "show":
+            cmd.add_argument("--start", type=int, default=0)
+            cmd.add_argument("--stop", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        sim = TrafficSimulation(seed=args.seed, arrival_rates={r: args.arrival_rate for r in ROADS},
+                                controller=make_controller(args.controller))
+        with TraceRecorder(args.trace, sim, keyframe_every=args.keyframe_every):
+            sim.populate_demo()
+            for tick in range(args.ticks):
+                if args.emergency_every and tick and tick % args.emergency_every == 0:
+                    sim.toggle_emergency()
+                sim.step()
+        print(f"recorded {args.ticks} ticks (seed {sim.seed}) to {args.trace}")
+        return
+
+    reader = TraceReader(args.trace)
+    try:
+        if args.command == "info":
+            print(f"frames: {reader.frames}  dt: {reader.dt_ms} ms  seed: {reader.seed}  "
+                  f"controller: {reader.controller}  events: {len(reader.events)}  "
+                  f"keyframe every: {reader.keyframe_every}")
+        elif args.command == "show":
+            stop = args.start + 1 if args.stop is None else args.stop
+            for frame in reader.window(args.start, stop):
+                counts = {r: len(frame.cars[r][0]) for r in ROADS}
+                print(frame.tick, frame.lights, counts)
+        else:
+            mismatch = reader.verify()
+            print("replay matches" if mismatch is None else f"replay diverges at tick {mismatch}")
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import numpy as np
+
+# --- Struct-of-arrays vehicle storage ---
+# Each road is one lane holding its vehicles in preallocated NumPy arrays
+# instead of a list of dicts, so moving, stopping and culling a whole lane
+# is a handful of vectorized operations no matter how many cars it holds.
+#
+# Positions are stored along the road's axis (y for north/south, x for
+# east/west) as the rectangle's top-left coordinate, exactly like the old
+# car dicts; the other coordinate is the same for every car in the lane.
+#
+# Cars are kept in driving order in the live window [head, tail) of the
+# arrays: index head is the car furthest along, tail-1 the last to arrive.
+# Departures only ever happen at the front and arrivals at the back, so both
+# are O(1) moves of head/tail. When tail hits the end of the arrays the live
+# window is shifted back to 0 (or the arrays doubled), amortized O(1) per
+# car, and the live cars always stay one contiguous slice for NumPy.
+
+EMERGENCY = 1
+STOPPED = 2
+MIN_GAP = 5  # bumper-to-bumper distance kept by following cars
+# Below this many cars a lane steps in plain Python: a NumPy call costs
+# about a microsecond however few elements it touches, and at normal demand
+# most lanes hold a handful of cars. Both paths do the same float64
+# operations in the same order, so results are bit-identical.
+SMALL_LANE = 24
+
+
+class Lane:
+    def __init__(self, axis, sign, cross, length, breadth, spawn_at, exit_at, stop_at, capacity=64):
+        self.axis = axis          # 'x' or 'y'
+        self.sign = sign          # +1 if the coordinate grows as cars drive on
+        self.cross = cross        # fixed coordinate on the other axis
+        self.length = length      # car extent along the axis
+        self.breadth = breadth    # car extent across the axis
+        self.spawn_at = spawn_at  # position of the first car on an empty lane
+        self.exit_at = exit_at    # cars past this (in driving direction) are gone
+        self.stop_at = stop_at    # stop line
+        self.head = 0
+        self.tail = 0
+        self.queued = 0           # cars whose front hasn't crossed the stop line
+        self.stopped = 0          # cars that didn't move on the last step
+        self.settled = False      # every car held on a non-green light: stepping again changes nothing
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.pos = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros((capacity, 2), dtype=np.float32)  # (along, across)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.color = np.zeros(capacity, dtype=np.uint32)       # 0xRRGGBB
+        self.vid = np.zeros(capacity, dtype=np.int64)
+
+    def _make_room(self):
+        live = self.live
+        n = len(self)
+        old = (self.pos, self.size, self.flags, self.color, self.vid)
+        if n > len(self.pos) // 2:
+            self._alloc(2 * len(self.pos))
+        for new, arr in zip((self.pos, self.size, self.flags, self.color, self.vid), old):
+            new[:n] = arr[live]
+        self.head, self.tail = 0, n
+
+    def __len__(self):
+        return self.tail - self.head
+
+    @property
+    def live(self):
+        """Slice of the arrays holding the cars, front first."""
+        return slice(self.head, self.tail)
+
+    def _front(self, pos, along):
+        # Progress of each car's front bumper: grows as cars drive on
+        return pos + along if self.sign > 0 else -pos
+
+    def _pos_from_front(self, front, along):
+        return front - along if self.sign > 0 else -front
+
+    def spawn(self, vid, color, emergency=False):
+        """Appends a car behind the last one (or at the lane entry)."""
+        if self.tail == len(self.pos):
+            self._make_room()
+        front = self._front(self.spawn_at, self.length)
+        if self.tail > self.head:
+            last = self.tail - 1
+            along = float(self.size[last, 0])
+            rear = self._front(float(self.pos[last]), along) - along
+            front = min(front, rear - MIN_GAP)
+        i = self.tail
+        self.pos[i] = self._pos_from_front(front, self.length)
+        self.size[i] = (self.length, self.breadth)
+        self.flags[i] = EMERGENCY if emergency else 0
+        self.color[i] = color
+        self.vid[i] = vid
+        self.tail += 1
+        self.settled = False
+        self.queued += 1  # new cars always enter behind the stop line
+        return i
+
+    def step(self, green, speed):
+        """Moves every car one tick with car-following and culls the ones
+        that left; returns how many left.
+
+        Each car wants to advance speed, but not past the stop line on a
+        non-green light (unless it's an emergency vehicle or already over
+        it) and not closer than MIN_GAP to the new position of the car ahead.
+        Writing S_i for the total length + gap of the cars ahead of car i,
+        new_front_i + S_i = min(want_i + S_i, new_front_{i-1} + S_{i-1}), so
+        the whole lane resolves in one running minimum.
+        """
+        if self.tail == self.head:
+            self.stopped = 0
+            return 0
+        if self.settled and not green:
+            return 0
+        if self.tail - self.head < SMALL_LANE:
+            return self._step_small(green, speed)
+        live = self.live
+        along = self.size[live, 0].astype(np.float64)
+        flags = self.flags[live]
+        front = self._front(self.pos[live], along)
+        stop = self.sign * self.stop_at
+
+        want = front + speed
+        if not green:
+            held = (front <= stop) & ~(flags & EMERGENCY).astype(bool)
+            want = np.where(held, np.minimum(want, stop), want)
+        spacing = np.zeros_like(front)
+        np.cumsum(along[:-1] + MIN_GAP, out=spacing[1:])
+        new_front = np.minimum.accumulate(want + spacing) - spacing
+        new_front = np.maximum(new_front, front)  # never reverse
+
+        moved = new_front > front
+        self.pos[live] = self._pos_from_front(new_front, along)
+        flags[:] = np.where(moved, flags & ~np.uint8(STOPPED), flags | np.uint8(STOPPED))
+        self.queued = int(np.count_nonzero(new_front <= stop))
+        self.stopped = len(moved) - int(np.count_nonzero(moved))
+        self.settled = not green and self.stopped == len(moved)
+
+        # Cars leave from the front only: cull the leading run past the exit
+        rear = new_front - along
+        gone = int(np.count_nonzero(rear > self.sign * self.exit_at))
+        self.head += gone
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        return gone
+
+    def _step_small(self, green, speed):
+        """step() for a few cars, one scalar at a time."""
+        head, tail = self.head, self.tail
+        forward = self.sign > 0
+        positions = self.pos[head:tail].tolist()
+        alongs = self.size[head:tail, 0].tolist()
+        flags = self.flags[head:tail].tolist()
+        stop = self.sign * self.stop_at
+        exit_at = self.sign * self.exit_at
+
+        limit = float('inf')
+        spacing = 0.0
+        queued = stopped = gone = 0
+        for i, pos in enumerate(positions):
+            along = alongs[i]
+            front = pos + along if forward else -pos
+            want = front + speed
+            if not green and front <= stop and want > stop and not flags[i] & EMERGENCY:
+                want = stop
+            if want + spacing < limit:
+                limit = want + spacing
+            new_front = limit - spacing
+            if new_front < front:
+                new_front = front
+            spacing += along + MIN_GAP
+            positions[i] = new_front - along if forward else -new_front
+            if new_front > front:
+                flags[i] &= ~STOPPED
+            else:
+                flags[i] |= STOPPED
+                stopped += 1
+            if new_front <= stop:
+                queued += 1
+            if new_front - along > exit_at:
+                gone += 1
+        self.pos[head:tail] = positions
+        self.flags[head:tail] = flags
+        self.queued = queued
+        self.stopped = stopped
+        self.settled = not green and stopped == len(positions)
+
+        self.head += gone
+        if self.head == self.tail:
+            self.head = self.tail = 0
+        return gone
+
+    def mark_emergency(self, i):
+        self.flags[i] |= EMERGENCY
+        self.settled = False
+
+    def stopped_count(self):
+        """Cars that didn't move on the last step."""
+        return self.stopped
+
+    def contains(self, vid):
+        return bool((self.vid[self.live] == vid).any())
+
+    def front(self):
+        """Index of the car furthest along, or None if the lane is empty."""
+        return self.head if self.tail > self.head else None
+
+    def rects(self):
+        """(x0, y0, x1, y1) arrays for every car, front first, for renderers."""
+        live = self.live
+        pos = self.pos[live]
+        along = self.size[live, 0]
+        across = self.size[live, 1]
+        cross = np.full(len(self), self.cross)
+        if self.axis == 'y':
+            return cross, pos, cross + across, pos + along
+        return pos, cross, pos + along, cross + across